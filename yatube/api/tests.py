@@ -0,0 +1,130 @@
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='auth', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f'Пост {i}', group=cls.group)
+            for i in range(settings.POST_PER_PAGE + 3)
+        )
+        cls.post = Post.objects.create(author=cls.author, text='Последний')
+        Comment.objects.create(
+            author=cls.reader, post=cls.post, text='Комментарий'
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+
+    def test_feeds_are_paginated_by_cursor(self):
+        """Ленты отдают JSON-страницы со ссылками на следующую"""
+        urls = {
+            reverse('api:index'): settings.POST_PER_PAGE + 4,
+            reverse('api:group_list', args=['test-slug']):
+                settings.POST_PER_PAGE + 3,
+            reverse('api:profile', args=['auth']):
+                settings.POST_PER_PAGE + 4,
+        }
+        for url, total in urls.items():
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(
+                    len(data['results']), settings.POST_PER_PAGE
+                )
+                self.assertIsNone(data['previous'])
+                rest = self.client.get(data['next']).json()
+                self.assertEqual(
+                    len(data['results']) + len(rest['results']), total
+                )
+                self.assertIsNone(rest['next'])
+
+    def test_post_fields(self):
+        data = self.client.get(reverse('api:index')).json()['results'][0]
+        self.assertEqual(data['id'], self.post.pk)
+        self.assertEqual(data['author'], {
+            'username': 'auth', 'full_name': 'Лев Толстой',
+        })
+        self.assertIsNone(data['group'])
+        self.assertEqual(data['comments_count'], 1)
+
+    def test_unknown_group_and_bad_cursor(self):
+        response = self.client.get(
+            reverse('api:group_list', args=['missing'])
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.client.get(reverse('api:index'), {'cursor': 'x'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304 без выборки страницы"""
+        url = reverse('api:index')
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(len(queries), 1)
+
+    def test_etag_changes_after_edit(self):
+        url = reverse('api:post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            author=self.author, post=self.post, text='Ответ'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(response.json()['comments']['results']), 2)
+
+    def test_comments_are_paginated(self):
+        Comment.objects.bulk_create(
+            Comment(author=self.reader, post=self.post, text=f'Ещё {i}')
+            for i in range(settings.COMMENTS_PER_PAGE)
+        )
+        comments = self.client.get(
+            reverse('api:post_detail', args=[self.post.pk])
+        ).json()['comments']
+        self.assertEqual(
+            len(comments['results']), settings.COMMENTS_PER_PAGE
+        )
+        rest = self.client.get(comments['next']).json()
+        self.assertEqual(len(rest['results']), 1)
+        self.assertIsNone(rest['next'])
+
+    def test_follow_feed(self):
+        url = reverse('api:follow_index')
+        self.assertEqual(
+            self.client.get(url).status_code, HTTPStatus.UNAUTHORIZED
+        )
+        self.client.force_login(self.reader)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url).json()['results'], [])
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(
+            len(response.json()['results']), settings.POST_PER_PAGE
+        )
@@ -0,0 +1,213 @@
+"""JSON API лент только для чтения.
+
+Строки читаются через .values() без создания объектов моделей, страницы
+листаются курсором. ETag считается до выборки страницы по дате последней
+правки и поколению лент, поэтому ответ 304 стоит одного лёгкого запроса
+по индексу.
+"""
+from functools import wraps
+from http import HTTPStatus
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_safe
+
+from posts import timeline
+from posts.caching import feed_generation
+from posts.conditional import (conditional_page, latest_update, per_request,
+                               post_freshness)
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import CURSOR_PARAM, CursorPaginator, InvalidCursor
+
+AUTHOR_FIELDS = ('author__username', 'author__first_name',
+                 'author__last_name')
+POST_FIELDS = ('pk', 'text', 'pub_date', 'updated_at', 'version', 'image',
+               'image_width', 'image_height', 'comments_count',
+               'group__slug', 'group__title') + AUTHOR_FIELDS
+COMMENT_FIELDS = ('pk', 'text', 'created') + AUTHOR_FIELDS
+
+
+def _json(data, status=HTTPStatus.OK):
+    return JsonResponse(
+        data, status=status, encoder=DjangoJSONEncoder,
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+def _link(request, cursor, path=None):
+    if cursor is None:
+        return None
+    query = urlencode({CURSOR_PARAM: cursor})
+    return request.build_absolute_uri(f'{path or request.path}?{query}')
+
+
+def _bad_cursor():
+    return _json({'detail': 'Некорректный курсор'}, HTTPStatus.BAD_REQUEST)
+
+
+def _results(request, page_obj, serialize, path=None):
+    return {
+        'results': [serialize(row) for row in page_obj],
+        'next': _link(request, page_obj.next_cursor, path),
+        'previous': _link(request, page_obj.previous_cursor, path),
+    }
+
+
+def _author(row):
+    full_name = f"{row['author__first_name']} {row['author__last_name']}"
+    return {
+        'username': row['author__username'],
+        'full_name': full_name.strip(),
+    }
+
+
+def _post(row):
+    group = None
+    if row['group__slug']:
+        group = {'slug': row['group__slug'], 'title': row['group__title']}
+    return {
+        'id': row['pk'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'updated_at': row['updated_at'],
+        'version': row['version'],
+        'author': _author(row),
+        'group': group,
+        'image': default_storage.url(row['image']) if row['image'] else None,
+        'image_width': row['image_width'],
+        'image_height': row['image_height'],
+        'comments_count': row['comments_count'],
+    }
+
+
+def _comment(row):
+    return {
+        'id': row['pk'],
+        'text': row['text'],
+        'created': row['created'],
+        'author': _author(row),
+    }
+
+
+def _login_required(view):
+    """Вместо редиректа на форму входа отвечает 401."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _json(
+                {'detail': 'Требуется авторизация'}, HTTPStatus.UNAUTHORIZED
+            )
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _feed(posts):
+    """Представление ленты.
+
+    posts(request, **kwargs) возвращает queryset постов ленты.
+    """
+    posts = per_request(posts)
+
+    def freshness(request, **kwargs):
+        return feed_generation(), latest_update(posts(request, **kwargs))
+
+    @require_safe
+    @conditional_page(freshness, per_visitor=False)
+    def view(request, **kwargs):
+        paginator = CursorPaginator(
+            posts(request, **kwargs).values(*POST_FIELDS),
+            settings.POST_PER_PAGE,
+        )
+        try:
+            page_obj = paginator.page(request.GET.get(CURSOR_PARAM))
+        except InvalidCursor:
+            return _bad_cursor()
+        return _json(_results(request, page_obj, _post))
+    return view
+
+
+def _following(request):
+    follows = Follow.objects.filter(user=request.user).aggregate(
+        last=Max('pk'), total=Count('pk')
+    )
+    return f"{request.user.pk}-{follows['last']}-{follows['total']}"
+
+
+index = _feed(lambda request: Post.objects.all())
+group_posts = _feed(
+    lambda request, slug: get_object_or_404(Group, slug=slug).posts.all()
+)
+profile_posts = _feed(
+    lambda request, username: get_object_or_404(
+        User, username=username
+    ).posts.all()
+)
+
+
+def _follow_freshness(request):
+    return (
+        feed_generation(), timeline.latest_update(request.user),
+        _following(request),
+    )
+
+
+@_login_required
+@require_safe
+@conditional_page(_follow_freshness, per_visitor=False)
+def follow_index(request):
+    """Лента подписок: курсор по материализованной ленте."""
+    try:
+        page_obj = timeline.feed_page(
+            request.user, request.GET.get(CURSOR_PARAM),
+            Post.objects.values(*POST_FIELDS),
+        )
+    except InvalidCursor:
+        return _bad_cursor()
+    return _json(_results(request, page_obj, _post))
+
+
+def _post_freshness(request, post_id):
+    post = get_object_or_404(
+        Post.objects.values('pk', 'updated_at', 'version', 'comments_count'),
+        pk=post_id,
+    )
+    return post_freshness(**post)
+
+
+def _comments_page(post_id, cursor=None):
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).values(*COMMENT_FIELDS),
+        settings.COMMENTS_PER_PAGE,
+        ordering=('-created', '-pk'),
+    )
+    return paginator.page(cursor)
+
+
+@require_safe
+@conditional_page(_post_freshness, per_visitor=False)
+def post_detail(request, post_id):
+    """Пост с первой порцией комментариев и ссылкой на следующую."""
+    row = Post.objects.values(*POST_FIELDS).get(pk=post_id)
+    comments = _comments_page(post_id)
+    data = _post(row)
+    data['comments'] = _results(
+        request, comments, _comment,
+        reverse('api:post_comments', args=[post_id]),
+    )
+    return _json(data)
+
+
+@require_safe
+@conditional_page(_post_freshness, per_visitor=False)
+def post_comments(request, post_id):
+    try:
+        comments = _comments_page(post_id, request.GET.get(CURSOR_PARAM))
+    except InvalidCursor:
+        return _bad_cursor()
+    return _json(_results(request, comments, _comment))
@@ -0,0 +1,102 @@
+"""Бэкенды кеша со счётчиками попаданий и промахов.
+
+Счётчики ведутся в памяти процесса и группируются по пространству
+имён ключа: ``posts:index``, ``posts:feed``,
+``template.cache.index_post`` и т.п.
+"""
+import threading
+from collections import Counter
+
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from . import metrics
+
+_lock = threading.Lock()
+_hits = Counter()
+_misses = Counter()
+_MISSING = object()
+
+
+def namespace(key):
+    if key.startswith('template.cache.'):
+        return '.'.join(key.split('.')[:3])
+    return ':'.join(key.split(':')[:2])
+
+
+def _record(hit_keys, miss_keys):
+    with _lock:
+        _hits.update(namespace(key) for key in hit_keys)
+        _misses.update(namespace(key) for key in miss_keys)
+    request_metrics = metrics.current()
+    if request_metrics is not None:
+        request_metrics.cache_hits += len(hit_keys)
+        request_metrics.cache_misses += len(miss_keys)
+
+
+def stats():
+    """Снимок счётчиков: {пространство имён: (попадания, промахи)}."""
+    with _lock:
+        return {
+            name: (_hits[name], _misses[name])
+            for name in sorted(set(_hits) | set(_misses))
+        }
+
+
+def reset_stats():
+    with _lock:
+        _hits.clear()
+        _misses.clear()
+
+
+class InstrumentedCacheMixin:
+    """Считает обращения ровно один раз.
+
+    Встроенные бэкенды вызывают get и get_many друг через друга,
+    поэтому вложенные вызовы в том же потоке не учитываются.
+    """
+    _local = threading.local()
+
+    def _nested(self):
+        return getattr(self._local, 'depth', 0) > 0
+
+    def _call(self, method, *args):
+        self._local.depth = getattr(self._local, 'depth', 0) + 1
+        try:
+            return method(*args)
+        finally:
+            self._local.depth -= 1
+
+    def get(self, key, default=None, version=None):
+        if self._nested():
+            return super().get(key, default, version)
+        value = self._call(super().get, key, _MISSING, version)
+        if value is _MISSING:
+            _record((), (key,))
+            return default
+        _record((key,), ())
+        return value
+
+    def get_many(self, keys, version=None):
+        if self._nested():
+            return super().get_many(keys, version)
+        keys = list(keys)
+        found = self._call(super().get_many, keys, version)
+        _record(
+            [key for key in keys if key in found],
+            [key for key in keys if key not in found],
+        )
+        return found
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+class InstrumentedFileBasedCache(InstrumentedCacheMixin, FileBasedCache):
+    pass
+
+
+class InstrumentedDatabaseCache(InstrumentedCacheMixin, DatabaseCache):
+    pass
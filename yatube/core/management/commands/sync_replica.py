@@ -0,0 +1,32 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует SQLite-базу default в файл реплики (DB_REPLICA) для '
+        'локальной проверки чтения с реплики'
+    )
+
+    def handle(self, *args, **options):
+        alias = settings.REPLICA_DATABASE
+        if alias not in settings.DATABASES:
+            raise CommandError('Реплика не настроена: задайте DB_REPLICA')
+        primary = connections[DEFAULT_DB_ALIAS]
+        replica = connections[alias]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError('Копирование поддерживается только для SQLite')
+        # соединение реплики держало бы старую копию файла открытой
+        replica.close()
+        primary.ensure_connection()
+        target = sqlite3.connect(replica.settings_dict['NAME'])
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+        self.stdout.write(
+            f"Реплика {replica.settings_dict['NAME']} обновлена"
+        )
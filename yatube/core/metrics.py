@@ -0,0 +1,103 @@
+"""Метрики запросов, собранные в памяти процесса.
+
+Для каждого имени view копятся гистограммы времени ответа, времени в
+БД, времени рендера шаблонов и числа SQL-запросов, а также попадания
+и промахи кеша. Всё хранится в памяти процесса и сбрасывается при его
+перезапуске.
+"""
+import bisect
+import threading
+
+MS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_lock = threading.Lock()
+_views = {}
+_current = threading.local()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    def as_dict(self):
+        labels = [f'<={bound}' for bound in self.buckets] + ['+Inf']
+        return {
+            'buckets': dict(zip(labels, self.counts)),
+            'sum': round(self.total, 3),
+        }
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.total_ms = Histogram(MS_BUCKETS)
+        self.db_ms = Histogram(MS_BUCKETS)
+        self.template_ms = Histogram(MS_BUCKETS)
+        self.queries = Histogram(COUNT_BUCKETS)
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'total_ms': self.total_ms.as_dict(),
+            'db_ms': self.db_ms.as_dict(),
+            'template_ms': self.template_ms.as_dict(),
+            'queries': self.queries.as_dict(),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+
+class RequestMetrics:
+    """Замеры одного запроса; живут в thread-local на время запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def start():
+    _current.metrics = RequestMetrics()
+    return _current.metrics
+
+
+def stop():
+    _current.metrics = None
+
+
+def current():
+    """Замеры текущего запроса или None вне запроса."""
+    return getattr(_current, 'metrics', None)
+
+
+def record(view_name, request_metrics, total_seconds):
+    with _lock:
+        view = _views.setdefault(view_name, ViewMetrics())
+        view.requests += 1
+        view.total_ms.observe(total_seconds * 1000)
+        view.db_ms.observe(request_metrics.db_seconds * 1000)
+        view.template_ms.observe(request_metrics.template_seconds * 1000)
+        view.queries.observe(request_metrics.queries)
+        view.cache_hits += request_metrics.cache_hits
+        view.cache_misses += request_metrics.cache_misses
+
+
+def snapshot():
+    with _lock:
+        return {name: view.as_dict() for name, view in sorted(_views.items())}
+
+
+def reset():
+    with _lock:
+        _views.clear()
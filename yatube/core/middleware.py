@@ -0,0 +1,48 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics
+
+
+def _timed_execute(request_metrics):
+    def wrapper(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            request_metrics.queries += 1
+            request_metrics.db_seconds += time.perf_counter() - started
+    return wrapper
+
+
+class MetricsMiddleware:
+    """Считает SQL, время БД, рендер шаблонов и кеш по каждому view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = metrics.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                wrapper = _timed_execute(request_metrics)
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.stop()
+        total = time.perf_counter() - started
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        metrics.record(view_name, request_metrics, total)
+        response['Server-Timing'] = (
+            f'db;dur={request_metrics.db_seconds * 1000:.1f}, '
+            f'tpl;dur={request_metrics.template_seconds * 1000:.1f}, '
+            f'total;dur={total * 1000:.1f}'
+        )
+        return response
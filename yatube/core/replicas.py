@@ -0,0 +1,76 @@
+"""Чтение с реплики.
+
+Представления с reads_from_replica читают модели приложений
+REPLICA_APPS из базы REPLICA_DATABASE, если она настроена; сессии,
+пользователи и запись всегда идут в default. Реплика отстаёт,
+поэтому после записи (pins_primary) посетитель получает cookie и ещё
+REPLICA_LAG секунд читает из default, чтобы сразу видеть свои изменения.
+"""
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'primary_until'
+
+_state = threading.local()
+
+
+def reading_replica():
+    """Читает ли текущий запрос с реплики."""
+    return getattr(_state, 'replica', False)
+
+
+def _pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (reading_replica()
+                and model._meta.app_label in settings.REPLICA_APPS):
+            return settings.REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплика — копия default, связи между ними допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == settings.REPLICA_DATABASE:
+            return False
+        return None
+
+
+def reads_from_replica(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        _state.replica = (
+            settings.REPLICA_DATABASE in settings.DATABASES
+            and not _pinned(request)
+        )
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _state.replica = False
+    return wrapper
+
+
+def pins_primary(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        response.set_cookie(
+            PIN_COOKIE, str(time.time() + settings.REPLICA_LAG),
+            max_age=settings.REPLICA_LAG, httponly=True, samesite='Lax',
+        )
+        return response
+    return wrapper
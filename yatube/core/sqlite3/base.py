@@ -0,0 +1,29 @@
+"""SQLite для нескольких процессов-воркеров.
+
+По умолчанию SQLite пишет через журнал отката: запись блокирует файл и
+для читателей, а каждый коммит ждёт fsync. В WAL читатели не мешают
+писателю, а с synchronous=NORMAL fsync делается только при checkpoint.
+Прагмы из SQLITE_PRAGMAS выполняются для каждого нового соединения.
+
+Транзакции начинаются с BEGIN IMMEDIATE. Отложенная транзакция берёт
+блокировку записи только на первом INSERT или UPDATE, и если другой
+процесс успел записать после её первого чтения, SQLite сразу отвечает
+database is locked, не дожидаясь busy_timeout.
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        # у базы в памяти нет файла, журнал для неё всегда memory
+        in_memory = self.is_in_memory_db()
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            if name == 'journal_mode' and in_memory:
+                continue
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,147 @@
+import copy
+import os
+import shutil
+import sqlite3
+import tempfile
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.template import engines
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from . import cache as instrumented
+from . import metrics, warmup
+from .sqlite3.base import DatabaseWrapper
+
+User = get_user_model()
+
+TEMP_CACHE_DIR = tempfile.mkdtemp()
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'core.cache.InstrumentedFileBasedCache',
+        'LOCATION': TEMP_CACHE_DIR,
+        'KEY_PREFIX': 'test',
+    }
+})
+class InstrumentedCacheTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self) -> None:
+        instrumented.reset_stats()
+
+    def test_hits_and_misses_by_namespace(self):
+        """Попадания и промахи считаются по пространству имён ключа"""
+        cache = caches['default']
+        cache.set('posts:index:1:', 'page')
+        cache.get('posts:index:1:')
+        cache.get('posts:index:2:')
+        cache.get_many(['posts:feed:generation', 'posts:index:1:'])
+        self.assertEqual(instrumented.stats(), {
+            'posts:feed': (0, 1),
+            'posts:index': (2, 1),
+        })
+
+    def test_file_cache_is_shared(self):
+        """Файловый кеш виден из другого экземпляра бэкенда"""
+        caches['default'].set('posts:index:1:', 'page')
+        other = instrumented.InstrumentedFileBasedCache(
+            TEMP_CACHE_DIR, {'KEY_PREFIX': 'test'}
+        )
+        self.assertEqual(other.get('posts:index:1:'), 'page')
+
+
+class MetricsMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+
+    def setUp(self) -> None:
+        caches['default'].clear()
+        metrics.reset()
+        self.guest_client = Client()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def test_metrics_recorded_per_view(self):
+        """Запросы, время БД, шаблоны и кеш копятся по имени view"""
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.guest_client.get(reverse('posts:index'))
+        index = metrics.snapshot()['posts:index']
+        self.assertEqual(index['requests'], 2)
+        self.assertGreater(index['queries']['sum'], 0)
+        self.assertGreater(index['template_ms']['sum'], 0)
+        self.assertGreater(index['cache_hits'], 0)
+        self.assertGreater(index['cache_misses'], 0)
+
+    def test_metrics_endpoint_is_staff_only(self):
+        """Эндпоинт метрик доступен только персоналу"""
+        url = reverse('core:metrics')
+        response = self.guest_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.staff_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('views', response.json())
+
+
+class TemplateWarmupTest(TestCase):
+    def test_warm_templates_fills_cached_loader(self):
+        """Прогрев загружает все шаблоны templates/ в кеш загрузчика"""
+        templates = copy.deepcopy(settings.TEMPLATES)
+        templates[0]['APP_DIRS'] = False
+        templates[0]['OPTIONS']['loaders'] = [(
+            'django.template.loaders.cached.Loader',
+            ['django.template.loaders.filesystem.Loader'],
+        )]
+        names = list(warmup.template_names(templates[0]['DIRS'][0]))
+        with self.settings(TEMPLATES=templates):
+            self.assertEqual(warmup.warm_templates(), len(names))
+            loader = engines.all()[0].engine.template_loaders[0]
+            self.assertIn('posts/index.html', loader.get_template_cache)
+            self.assertIn(
+                'includes/paginator.html', loader.get_template_cache
+            )
+
+
+class SqliteBackendTest(TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'test.sqlite3')
+        self.wrapper = DatabaseWrapper(
+            {**connection.settings_dict, 'NAME': self.path}, alias='file'
+        )
+        self.addCleanup(self.wrapper.close)
+
+    def pragma(self, name):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        # NORMAL
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(
+            self.pragma('busy_timeout'),
+            settings.SQLITE_PRAGMAS['busy_timeout'],
+        )
+
+    def test_transaction_takes_write_lock_at_once(self):
+        """Транзакция сразу блокирует запись другим соединениям"""
+        self.wrapper.ensure_connection()
+        self.wrapper._start_transaction_under_autocommit()
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        with self.assertRaisesMessage(sqlite3.OperationalError, 'locked'):
+            other.execute('CREATE TABLE t (id integer)')
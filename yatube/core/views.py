@@ -1,7 +1,11 @@
 from http import HTTPStatus
 
+from django.conf import settings
+from django.http import Http404, JsonResponse
 from django.shortcuts import render
 
+from . import cache, metrics
+
 
 def page_404(request, exception):
     return render(
@@ -17,8 +21,25 @@ def page_403_csrf(request, reason=''):
 
 
 def page_403(request, exception):
-    return render(request, 'core/403.html', HTTPStatus.FORBIDDEN)
+    return render(request, 'core/403.html', status=HTTPStatus.FORBIDDEN)
 
 
 def page_500(request):
-    return render(request, 'core/500.html', HTTPStatus.INTERNAL_SERVER_ERROR)
+    return render(
+        request, 'core/500.html', status=HTTPStatus.INTERNAL_SERVER_ERROR
+    )
+
+
+def metrics_view(request):
+    """Метрики процесса: для персонала и адресов METRICS_ALLOWED_IPS."""
+    if not (request.user.is_staff
+            or request.META.get('REMOTE_ADDR')
+            in settings.METRICS_ALLOWED_IPS):
+        raise Http404
+    return JsonResponse({
+        'views': metrics.snapshot(),
+        'cache': {
+            name: {'hits': hits, 'misses': misses}
+            for name, (hits, misses) in cache.stats().items()
+        },
+    })
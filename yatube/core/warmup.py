@@ -0,0 +1,42 @@
+"""Прогрев шаблонов при старте процесса.
+
+С кеширующим загрузчиком каждый шаблон читается и разбирается один раз
+на процесс, но этот раз приходится на первый запрос к странице. Прогрев
+заранее загружает все шаблоны из DIRS, включая include.
+"""
+import logging
+import os
+import time
+
+from django.template import TemplateSyntaxError, engines
+
+logger = logging.getLogger(__name__)
+
+
+def template_names(directory):
+    """Имена всех .html-шаблонов каталога относительно него."""
+    for root, _, files in os.walk(directory):
+        for filename in sorted(files):
+            if filename.endswith('.html'):
+                path = os.path.relpath(os.path.join(root, filename), directory)
+                yield path.replace(os.sep, '/')
+
+
+def warm_templates():
+    """Загружает шаблоны из DIRS всех движков, возвращает их число."""
+    started = time.perf_counter()
+    warmed = 0
+    for engine in engines.all():
+        for directory in engine.dirs:
+            for name in template_names(directory):
+                try:
+                    engine.get_template(name)
+                except TemplateSyntaxError:
+                    logger.exception('Не удалось разобрать шаблон %s', name)
+                else:
+                    warmed += 1
+    logger.info(
+        'Прогрето шаблонов: %d за %.3f с',
+        warmed, time.perf_counter() - started,
+    )
+    return warmed
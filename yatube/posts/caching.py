@@ -0,0 +1,67 @@
+"""Кеш лент с поколениями.
+
+Ключи страниц и фрагментов включают номер поколения, который
+сдвигается при каждом сохранении или удалении поста: старые записи
+перестают читаться сразу и просто вытесняются по таймауту.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import replicas
+
+from .utils import CURSOR_PARAM, CursorPaginator, InvalidCursor, get_page
+
+GENERATION_KEY = 'posts:feed:generation'
+# есть, пока реплика может не знать о последней записи
+BUMPED_KEY = 'posts:feed:bumped'
+
+
+def _initial_generation():
+    # после вытеснения ключа поколение не должно совпасть со старым
+    return int(time.time() * 1000)
+
+
+def feed_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, _initial_generation(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_feed_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, _initial_generation(), None)
+    cache.set(BUMPED_KEY, True, settings.REPLICA_LAG)
+
+
+def cached_page(prefix, queryset, request):
+    """Страница ленты из кеша текущего поколения.
+
+    Кешируются только курсорные страницы: у обычного Paginator при
+    сериализации вычислился бы весь queryset. Ключ — только курсор:
+    посторонние параметры вроде utm не плодят копии страницы, битый
+    курсор читает первую. Страница, прочитанная с реплики вскоре после
+    записи, может быть устаревшей и в кеш нового поколения не кладётся.
+    """
+    if 'page' in request.GET:
+        return get_page(queryset, request)
+    paginator = CursorPaginator(queryset, settings.POST_PER_PAGE)
+    cursor = request.GET.get(CURSOR_PARAM) or None
+    if cursor is not None:
+        try:
+            paginator.decode_cursor(cursor)
+        except InvalidCursor:
+            cursor = None
+    key = f'{prefix}:{feed_generation()}:{cursor or ""}'
+    page_obj = cache.get(key)
+    if page_obj is None:
+        page_obj = paginator.page(cursor)
+        lagging = replicas.reading_replica() and cache.get(BUMPED_KEY)
+        if not lagging:
+            cache.set(key, page_obj, settings.FEED_CACHE_TIMEOUT)
+    return page_obj
@@ -0,0 +1,81 @@
+"""Условные GET для страниц постов по ETag.
+
+Функция свежести страницы возвращает части ETag или None, если объекта
+нет, и считается до выборки самой страницы одним-двумя запросами по
+индексам. Страница поста ключуется его версией, а ленты — ещё и
+поколением лент. Last-Modified не отдаётся: удаление поста или
+комментария и подписка меняют страницу, но не двигают ни одной даты,
+и клиент с одним If-Modified-Since получал бы устаревший 304.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Max
+from django.views.decorators.http import condition
+
+from .models import Comment
+
+
+def make_etag(*parts):
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def per_request(func):
+    """Запоминает результат func на время запроса.
+
+    Условные функции condition() и само представление вызывают её по
+    очереди с одними аргументами, а запрос к базе нужен один.
+    """
+    @wraps(func)
+    def wrapper(request, *args, **kwargs):
+        memo = request.__dict__.setdefault('_per_request', {})
+        if func not in memo:
+            memo[func] = func(request, *args, **kwargs)
+        return memo[func]
+    return wrapper
+
+
+def latest_update(queryset):
+    """Время последней правки постов одним запросом по индексу updated_at.
+
+    Дата публикации не подходит: правка старого поста её не меняет.
+    """
+    return queryset.order_by('-updated_at').values_list(
+        'updated_at', flat=True
+    ).first()
+
+
+def post_freshness(pk, updated_at, version, comments_count):
+    """Части ETag страницы поста вместе с его комментариями."""
+    commented = Comment.objects.filter(post_id=pk).aggregate(
+        latest=Max('updated_at')
+    )['latest']
+    return pk, version, comments_count, commented
+
+
+def _visitor(request):
+    # разметка зависит от посетителя, а форма — от его CSRF-токена
+    return (
+        request.user.pk,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    )
+
+
+def conditional_page(freshness, per_visitor=True):
+    """condition() с ETag по функции freshness(request, *args, **kwargs).
+
+    С per_visitor ETag различается для каждого пользователя и его
+    CSRF-токена: HTML-страницы, в отличие от API, это учитывают.
+    """
+    freshness = per_request(freshness)
+
+    def etag(request, *args, **kwargs):
+        parts = freshness(request, *args, **kwargs)
+        if parts is None:
+            return None
+        if per_visitor:
+            parts += _visitor(request)
+        return make_etag(request.GET.urlencode(), *parts)
+
+    return condition(etag_func=etag)
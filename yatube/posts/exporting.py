@@ -0,0 +1,177 @@
+"""Потоковая выгрузка постов, комментариев и подписок.
+
+В отличие от dumpdata данные не загружаются в память целиком: строки
+читаются пачками по первичному ключу и сразу превращаются в строки
+JSONL или CSV, которые можно писать в файл или отдавать через
+StreamingHttpResponse. Посты выгружаются в формате import_posts.
+"""
+import csv
+import json
+import zlib
+
+from django.db.models import Q
+
+from .importing import CSV_FIELDS
+from .models import Comment, Follow, Post
+
+CHUNK_SIZE = 1000
+GZIP_FLUSH_SIZE = 64 * 1024
+
+FIELDS = {
+    'posts': CSV_FIELDS,
+    'comments': ('post', 'author', 'text', 'created'),
+    'follows': ('user', 'author'),
+}
+
+
+def _chunks(queryset, size=CHUNK_SIZE):
+    """Пачки строк по возрастанию pk без OFFSET и без кеша queryset."""
+    last = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last).order_by('pk')[:size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]['pk']
+
+
+def _date(value):
+    return value.isoformat() if value else None
+
+
+def _filtered(queryset, author=None, group=None, since=None, until=None,
+              prefix='', date_field=None):
+    if author:
+        queryset = queryset.filter(**{f'{prefix}author__username': author})
+    if group:
+        queryset = queryset.filter(**{f'{prefix}group__slug': group})
+    if since:
+        queryset = queryset.filter(**{f'{date_field}__gte': since})
+    if until:
+        queryset = queryset.filter(**{f'{date_field}__lt': until})
+    return queryset
+
+
+def posts(with_comments=True, **filters):
+    """Посты с вложенными комментариями; фильтры — как у _filtered."""
+    queryset = _filtered(
+        Post.objects.all(), date_field='pub_date', **filters
+    ).values(
+        'pk', 'text', 'pub_date', 'image', 'author__username', 'group__slug'
+    )
+    for chunk in _chunks(queryset):
+        nested = {}
+        if with_comments:
+            rows = Comment.objects.filter(
+                post_id__in=[row['pk'] for row in chunk]
+            ).order_by('pk').values(
+                'post_id', 'text', 'created', 'author__username'
+            )
+            for row in rows:
+                nested.setdefault(row['post_id'], []).append({
+                    'author': row['author__username'],
+                    'text': row['text'],
+                    'created': _date(row['created']),
+                })
+        for row in chunk:
+            record = {
+                'author': row['author__username'],
+                'text': row['text'],
+                'group': row['group__slug'],
+                'pub_date': _date(row['pub_date']),
+                'image': row['image'] or None,
+            }
+            if with_comments:
+                record['comments'] = nested.get(row['pk'], [])
+            yield record
+
+
+def comments(author=None, group=None, since=None, until=None):
+    """Комментарии; author — автор комментария, group — группа поста."""
+    queryset = _filtered(
+        Comment.objects.all(), author=author, since=since, until=until,
+        date_field='created',
+    )
+    queryset = _filtered(queryset, group=group, prefix='post__')
+    queryset = queryset.values('pk', 'post_id', 'text', 'created',
+                               'author__username')
+    for chunk in _chunks(queryset):
+        for row in chunk:
+            yield {
+                'post': row['post_id'],
+                'author': row['author__username'],
+                'text': row['text'],
+                'created': _date(row['created']),
+            }
+
+
+def follows(author=None, **filters):
+    """Подписки, где author — подписчик или автор.
+
+    Фильтры по группе и датам к подпискам не относятся и не применяются.
+    """
+    queryset = Follow.objects.all()
+    if author:
+        queryset = queryset.filter(
+            Q(user__username=author) | Q(author__username=author)
+        )
+    queryset = queryset.values('pk', 'user__username', 'author__username')
+    for chunk in _chunks(queryset):
+        for row in chunk:
+            yield {
+                'user': row['user__username'],
+                'author': row['author__username'],
+            }
+
+
+EXPORTERS = {'posts': posts, 'comments': comments, 'follows': follows}
+
+
+def jsonl_lines(records, fields=None):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class _Line:
+    """Буфер для csv.writer, который просто возвращает строку."""
+    def write(self, value):
+        return value
+
+
+def csv_lines(records, fields):
+    writer = csv.writer(_Line())
+    yield writer.writerow(fields)
+    for record in records:
+        yield writer.writerow([
+            '' if record.get(field) is None else record[field]
+            for field in fields
+        ])
+
+
+WRITERS = {'jsonl': jsonl_lines, 'csv': csv_lines}
+
+
+def gzipped(lines):
+    """Сжимает поток строк в gzip, отдавая байты порциями."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    pending = []
+    size = 0
+    for line in lines:
+        data = compressor.compress(line.encode())
+        if data:
+            pending.append(data)
+            size += len(data)
+        if size >= GZIP_FLUSH_SIZE:
+            yield b''.join(pending)
+            pending, size = [], 0
+    pending.append(compressor.flush())
+    yield b''.join(pending)
+
+
+def export(kind, fmt='jsonl', gzip=False, **filters):
+    """Поток выгрузки: строки, а с gzip — байты."""
+    if kind == 'posts' and fmt == 'csv':
+        # в CSV комментариям нет места, не читаем их зря
+        filters['with_comments'] = False
+    lines = WRITERS[fmt](EXPORTERS[kind](**filters), FIELDS[kind])
+    return gzipped(lines) if gzip else lines
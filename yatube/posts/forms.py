@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
 from .models import Comment, Post
+from .uploads import ProcessedImage, process_image
 
 
 class PostForm(forms.ModelForm):
@@ -12,6 +14,22 @@ class PostForm(forms.ModelForm):
             'image'
         )
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # без новой загрузки здесь уже сохранённый файл или False
+        if isinstance(image, UploadedFile):
+            return process_image(image)
+        return image
+
+    def save(self, commit=True):
+        image = self.cleaned_data.get('image')
+        if not image:
+            self.instance.image_width = self.instance.image_height = None
+        elif isinstance(image, ProcessedImage):
+            self.instance.image_width = image.width
+            self.instance.image_height = image.height
+        return super().save(commit)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,283 @@
+"""Пакетный импорт постов и комментариев из JSONL и CSV.
+
+Записи читаются потоком и вставляются через bulk_create пачками, каждая
+пачка в своей транзакции. Сигналы при этом не срабатывают, поэтому
+поисковый индекс и ленты подписок заполняются здесь же для каждой
+пачки, а счётчики пересчитываются один раз после импорта.
+"""
+import csv
+import json
+import os
+import time
+from collections import Counter
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import search, timeline
+from .caching import bump_feed_generation
+from .models import Comment, Group, Post, PostTerm
+from .uploads import process_image
+
+User = get_user_model()
+STORAGE = Post._meta.get_field('image').storage
+
+BATCH_SIZE = 1000
+CSV_FIELDS = ('author', 'text', 'group', 'pub_date', 'image')
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def read_jsonl(stream):
+    """Пары (номер строки, запись); битый JSON даёт запись None."""
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+def read_csv(stream):
+    """Пары (номер строки, запись) из CSV с заголовком."""
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def _date(value):
+    if not value:
+        return None
+    date = parse_datetime(value)
+    if date is None:
+        raise InvalidRecord(f'не удалось разобрать дату {value!r}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def _required(record, name):
+    value = record.get(name)
+    if not isinstance(value, str) or not value.strip():
+        raise InvalidRecord(f'не заполнено поле {name}')
+    return value
+
+
+def clean(record):
+    """Проверяет запись и приводит её поля к нужным типам."""
+    if not isinstance(record, dict):
+        raise InvalidRecord('запись должна быть объектом')
+    comments = record.get('comments') or []
+    if not isinstance(comments, list):
+        raise InvalidRecord('comments должен быть списком')
+    try:
+        comments = [
+            {
+                'author': _required(comment, 'author'),
+                'text': _required(comment, 'text'),
+                'created': _date(comment.get('created')),
+            }
+            for comment in comments
+        ]
+    except AttributeError:
+        raise InvalidRecord('комментарий должен быть объектом')
+    return {
+        'author': _required(record, 'author'),
+        'text': _required(record, 'text'),
+        'group': record.get('group') or None,
+        'pub_date': _date(record.get('pub_date')),
+        'image': record.get('image') or None,
+        'comments': comments,
+    }
+
+
+def _insert(model, objs):
+    """bulk_create, после которого у объектов заполнен pk."""
+    if connection.features.can_return_ids_from_bulk_insert:
+        model.objects.bulk_create(objs)
+        return
+    # SQLite id не возвращает; запись в транзакции у него
+    # сериализована, и все строки с pk больше прежнего максимума наши
+    last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+    model.objects.bulk_create(objs)
+    pks = model.objects.filter(pk__gt=last).order_by('pk')
+    for obj, pk in zip(objs, pks.values_list('pk', flat=True)):
+        obj.pk = pk
+
+
+def _keep_dates(objs, field, dates):
+    """Возвращает исходные даты, которые затёрли auto_now_add и auto_now.
+
+    Импортированная запись с тех пор не менялась, поэтому updated_at
+    совпадает с датой создания.
+    """
+    dated = []
+    for obj, date in zip(objs, dates):
+        if date is not None:
+            setattr(obj, field, date)
+            obj.updated_at = date
+            dated.append(obj)
+    if dated:
+        type(dated[0]).objects.bulk_update(dated, [field, 'updated_at'])
+
+
+class Importer:
+    """Импортирует записи пачками по batch_size.
+
+    Авторы и группы ищутся по username и slug с кешем на весь импорт,
+    включая отсутствующие. С create_missing отсутствующие создаются,
+    иначе запись пропускается. Картинки из images_dir копируются в
+    хранилище через ту же обработку, что и загрузки из формы, без него
+    поле image считается именем уже загруженного файла.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, create_missing=False,
+                 images_dir=None, warn=None, progress=None):
+        self.batch_size = batch_size
+        self.create_missing = create_missing
+        self.images_dir = images_dir
+        self.warn = warn or (lambda message: None)
+        self.progress = progress or (lambda importer: None)
+        self.users = {}
+        self.groups = {}
+        self.counts = Counter()
+        self.started = None
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        """Записей в секунду с начала импорта."""
+        return self.counts['records'] / max(self.elapsed, 1e-9)
+
+    def skip(self, number, reason):
+        self.counts['skipped'] += 1
+        self.warn(f'Строка {number} пропущена: {reason}')
+
+    def run(self, records):
+        self.started = time.monotonic()
+        batch = []
+        for number, record in records:
+            self.counts['records'] += 1
+            try:
+                batch.append((number, clean(record)))
+            except InvalidRecord as error:
+                self.skip(number, error)
+                continue
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+        if batch:
+            self.flush(batch)
+        if self.counts['posts']:
+            call_command('rebuild_counters', stdout=StringIO())
+            bump_feed_generation()
+        return self.counts
+
+    def _resolve(self, model, field, cache, keys, defaults):
+        missing = set(keys) - cache.keys()
+        if not missing:
+            return
+        existing = model.objects.filter(**{f'{field}__in': missing})
+        cache.update(existing.values_list(field, 'pk'))
+        missing -= cache.keys()
+        if missing and self.create_missing:
+            model.objects.bulk_create(
+                model(**{field: key}, **defaults(key)) for key in missing
+            )
+            created = model.objects.filter(**{f'{field}__in': missing})
+            cache.update(created.values_list(field, 'pk'))
+            self.counts[f'created_{model._meta.model_name}'] += len(missing)
+        cache.update(dict.fromkeys(missing - cache.keys()))
+
+    def _image(self, name):
+        """Имя файла в хранилище и размеры картинки, если они известны."""
+        if not name or not self.images_dir:
+            return name or '', None, None
+        path = os.path.join(self.images_dir, name)
+        with open(path, 'rb') as source:
+            image = process_image(File(source, os.path.basename(name)))
+            saved = STORAGE.save(f'posts/{image.name}', image)
+        return saved, image.width, image.height
+
+    def _post(self, number, item):
+        """Несохранённый пост записи или None, если она пропущена."""
+        author_id = self.users[item['author']]
+        group_id = self.groups.get(item['group'])
+        if author_id is None:
+            return self.skip(number, f'нет автора {item["author"]}')
+        if item['group'] and group_id is None:
+            return self.skip(number, f'нет группы {item["group"]}')
+        try:
+            image, width, height = self._image(item['image'])
+        except OSError as error:
+            return self.skip(number, error)
+        except ValidationError as error:
+            return self.skip(number, ' '.join(error.messages))
+        return Post(
+            text=item['text'], author_id=author_id, group_id=group_id,
+            image=image, image_width=width, image_height=height,
+        )
+
+    def flush(self, batch):
+        with transaction.atomic():
+            self._resolve(
+                User, 'username', self.users,
+                {item['author'] for _, item in batch} | {
+                    comment['author']
+                    for _, item in batch for comment in item['comments']
+                },
+                lambda username: {'password': make_password(None)},
+            )
+            self._resolve(
+                Group, 'slug', self.groups,
+                {item['group'] for _, item in batch if item['group']},
+                lambda slug: {'title': slug, 'description': ''},
+            )
+            posts, items = [], []
+            for number, item in batch:
+                post = self._post(number, item)
+                if post is not None:
+                    posts.append(post)
+                    items.append(item)
+            _insert(Post, posts)
+            _keep_dates(posts, 'pub_date', [i['pub_date'] for i in items])
+
+            comments, dates = [], []
+            for post, item in zip(posts, items):
+                for comment in item['comments']:
+                    author_id = self.users[comment['author']]
+                    if author_id is None:
+                        self.counts['skipped_comments'] += 1
+                        continue
+                    comments.append(Comment(
+                        text=comment['text'], author_id=author_id,
+                        post_id=post.pk,
+                    ))
+                    dates.append(comment['created'])
+            if any(dates):
+                _insert(Comment, comments)
+                _keep_dates(comments, 'created', dates)
+            else:
+                Comment.objects.bulk_create(comments)
+
+            PostTerm.objects.bulk_create(
+                entry for post in posts for entry in search.entries(post)
+            )
+            timeline.fan_out_many(posts)
+        self.counts['posts'] += len(posts)
+        self.counts['comments'] += len(comments)
+        self.progress(self)
@@ -0,0 +1,154 @@
+import json
+import multiprocessing
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts.caching import bump_feed_generation
+from posts.models import Post
+
+from .benchmark_posts import percentile
+
+User = get_user_model()
+
+PREFIX = 'benchmark-concurrency'
+ACTIONS = ('add_comment', 'profile_follow', 'profile_unfollow')
+
+
+def _worker(user_pk, post_pk, author, requests):
+    """Запросы одного процесса: время по действиям и число блокировок."""
+    client = Client()
+    client.force_login(User.objects.get(pk=user_pk))
+    urls = {
+        'add_comment': reverse('posts:add_comment', args=[post_pk]),
+        'profile_follow': reverse('posts:profile_follow', args=[author]),
+        'profile_unfollow': reverse('posts:profile_unfollow', args=[author]),
+    }
+    timings = defaultdict(list)
+    locked = defaultdict(int)
+    for number in range(requests):
+        action = ACTIONS[number % len(ACTIONS)]
+        started = time.perf_counter()
+        try:
+            if action == 'add_comment':
+                client.post(urls[action], {'text': f'Комментарий {number}'})
+            else:
+                client.get(urls[action])
+        except OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            locked[action] += 1
+        else:
+            timings[action].append(time.perf_counter() - started)
+    connections.close_all()
+    return timings, locked
+
+
+class Command(BaseCommand):
+    help = (
+        'Конкурентная запись: несколько процессов комментируют пост и '
+        'подписываются на автора. Пишет в настоящую базу, созданные '
+        'данные удаляются в конце.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=150,
+                            help='Запросов на процесс')
+        parser.add_argument('--no-pragmas', action='store_true',
+                            help='Замер без WAL и прагм SQLITE_PRAGMAS')
+        parser.add_argument('--output', help='Куда сохранить JSON')
+
+    def setup(self, workers):
+        self.cleanup()
+        author = User.objects.create_user(username=f'{PREFIX}-author')
+        post = Post.objects.create(author=author, text='Пост для замера')
+        users = [
+            User.objects.create_user(username=f'{PREFIX}-{number}')
+            for number in range(workers)
+        ]
+        return author, post, users
+
+    def cleanup(self):
+        User.objects.filter(username__startswith=PREFIX).delete()
+        bump_feed_generation()
+
+    def disable_pragmas(self):
+        """Отключает прагмы и возвращает файлу обычный журнал."""
+        connections.close_all()
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode = delete')
+
+    def report(self, results, elapsed):
+        timings, locked = defaultdict(list), defaultdict(int)
+        for worker_timings, worker_locked in results:
+            for action in ACTIONS:
+                timings[action] += worker_timings[action]
+                locked[action] += worker_locked[action]
+        actions = {}
+        for action in ACTIONS:
+            values = timings[action] or [0]
+            actions[action] = {
+                'ok': len(timings[action]),
+                'locked': locked[action],
+                'p50_ms': round(percentile(values, 50) * 1000, 3),
+                'p95_ms': round(percentile(values, 95) * 1000, 3),
+            }
+        total = sum(len(values) for values in timings.values())
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'requests_per_s': round(total / elapsed, 1),
+            'actions': actions,
+        }
+
+    def run(self, options):
+        author, post, users = self.setup(options['workers'])
+        try:
+            # дочерние процессы не должны делить соединение родителя
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            started = time.perf_counter()
+            with context.Pool(options['workers']) as pool:
+                results = pool.starmap(_worker, [
+                    (user.pk, post.pk, author.username, options['requests'])
+                    for user in users
+                ])
+            return self.report(results, time.perf_counter() - started)
+        finally:
+            self.cleanup()
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise CommandError('База в памяти не видна другим процессам')
+        if settings.DEBUG:
+            self.stderr.write(
+                'DEBUG включён, время уйдёт на debug_toolbar: '
+                'запускайте с DJANGO_ENV=prod'
+            )
+        if options['no_pragmas']:
+            # процессы-воркеры наследуют настройки при fork
+            with override_settings(SQLITE_PRAGMAS={}):
+                self.disable_pragmas()
+                report = self.run(options)
+        else:
+            report = self.run(options)
+        report['workers'] = options['workers']
+        report['pragmas'] = not options['no_pragmas']
+        for action, result in report['actions'].items():
+            self.stdout.write(
+                '{action}: {ok} ок, блокировок {locked}, p50 {p50_ms} мс, '
+                'p95 {p95_ms} мс'.format(action=action, **result)
+            )
+        self.stdout.write(
+            f"Всего {report['requests_per_s']} запросов/с "
+            f"за {report['elapsed_s']} с"
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
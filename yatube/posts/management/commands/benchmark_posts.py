@@ -0,0 +1,199 @@
+import json
+import math
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api import urls as api_urls
+from posts import urls
+from posts.caching import bump_feed_generation
+from posts.models import Follow, Group, Post
+from posts.seeding import seed
+
+User = get_user_model()
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный замер всех страниц posts: p50/p95, запросы к БД и '
+        'память на запрос. Данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Сколько раз запрашивать каждую страницу')
+        parser.add_argument('--output', help='Куда сохранить JSON')
+        parser.add_argument('--compare',
+                            help='JSON прошлого запуска для сравнения')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимый рост p95, доля')
+
+    def routes(self):
+        """Метод, адрес, клиент и данные для каждого имени posts и api."""
+        post = Post.objects.order_by('-comments_count', '-pk').first()
+        group = Group.objects.order_by('-posts_count').first()
+        follow = Follow.objects.order_by('-user__stats__following_count')
+        follow = follow.select_related('user', 'author').first()
+        if post is None or group is None or follow is None:
+            raise CommandError('Нужны посты, группы и подписки: --seed')
+        author = Client()
+        author.force_login(post.author)
+        reader = Client()
+        reader.force_login(follow.user)
+        target = follow.author.username
+        return {
+            'index': ('get', reverse('posts:index'), Client(), None),
+            'group_list': ('get', reverse(
+                'posts:group_list', args=[group.slug]), Client(), None),
+            'search': ('get', reverse('posts:search'), Client(),
+                       {'q': 'текст поста'}),
+            'profile': ('get', reverse(
+                'posts:profile', args=[post.author.username]),
+                Client(), None),
+            'post_detail': ('get', reverse(
+                'posts:post_detail', args=[post.pk]), Client(), None),
+            'post_comments': ('get', reverse(
+                'posts:post_comments', args=[post.pk]), Client(), None),
+            'post_create': ('get', reverse('posts:post_create'),
+                            author, None),
+            'post_edit': ('get', reverse(
+                'posts:post_edit', args=[post.pk]), author, None),
+            'add_comment': ('post', reverse(
+                'posts:add_comment', args=[post.pk]), reader,
+                {'text': 'Комментарий из бенчмарка'}),
+            'follow_index': ('get', reverse('posts:follow_index'),
+                             reader, None),
+            'archive': ('get', reverse('posts:archive'), author, None),
+            'profile_unfollow': ('get', reverse(
+                'posts:profile_unfollow', args=[target]), reader, None),
+            'profile_follow': ('get', reverse(
+                'posts:profile_follow', args=[target]), reader, None),
+            'api:index': ('get', reverse('api:index'), Client(), None),
+            'api:group_list': ('get', reverse(
+                'api:group_list', args=[group.slug]), Client(), None),
+            'api:profile': ('get', reverse(
+                'api:profile', args=[post.author.username]),
+                Client(), None),
+            'api:post_detail': ('get', reverse(
+                'api:post_detail', args=[post.pk]), Client(), None),
+            'api:post_comments': ('get', reverse(
+                'api:post_comments', args=[post.pk]), Client(), None),
+            'api:follow_index': ('get', reverse('api:follow_index'),
+                                 reader, None),
+        }
+
+    def request(self, method, url, client, data):
+        response = getattr(client, method)(url, data)
+        if response.streaming:
+            # потоковый ответ формируется только при чтении
+            b''.join(response.streaming_content)
+        return response
+
+    def measure(self, method, url, client, data, requests):
+        timings = []
+        queries = 0
+        status = None
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = self.request(method, url, client, data)
+                timings.append(time.perf_counter() - started)
+            queries = max(queries, len(captured))
+            status = response.status_code
+        # отдельный прогон: tracemalloc сильно замедляет запрос
+        tracemalloc.start()
+        tracemalloc.clear_traces()
+        self.request(method, url, client, data)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {
+            'status': status,
+            'p50_ms': round(percentile(timings, 50) * 1000, 3),
+            'p95_ms': round(percentile(timings, 95) * 1000, 3),
+            'queries': queries,
+            'memory_kb': round(peak / 1024, 1),
+        }
+
+    def run(self, options):
+        dataset = {
+            key: options[key]
+            for key in ('users', 'groups', 'posts', 'comments', 'follows')
+        }
+        seed(**dataset)
+        routes = self.routes()
+        missing = {
+            pattern.name for pattern in urls.urlpatterns
+        } | {
+            f'api:{pattern.name}' for pattern in api_urls.urlpatterns
+        }
+        missing -= set(routes)
+        if missing:
+            raise CommandError(f'Нет сценария для {sorted(missing)}')
+        results = {}
+        for name, (method, url, client, data) in routes.items():
+            results[name] = self.measure(
+                method, url, client, data, options['requests']
+            )
+            self.stdout.write(
+                '{name}: p50 {p50_ms} мс, p95 {p95_ms} мс, '
+                'запросов {queries}, память {memory_kb} КБ'.format(
+                    name=name, **results[name])
+            )
+        return {'dataset': dataset, 'routes': results}
+
+    def compare(self, report, baseline, threshold):
+        regressions = []
+        for name, current in report['routes'].items():
+            previous = baseline['routes'].get(name)
+            if previous is None:
+                continue
+            if current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+                regressions.append(
+                    f"{name}: p95 {previous['p95_ms']} → "
+                    f"{current['p95_ms']} мс"
+                )
+            if current['queries'] > previous['queries']:
+                regressions.append(
+                    f"{name}: запросов {previous['queries']} → "
+                    f"{current['queries']}"
+                )
+        return regressions
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                report = self.run(options)
+                transaction.set_rollback(True)
+        finally:
+            # страницы в общем кеше ссылаются на откаченные посты
+            bump_feed_generation()
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as baseline:
+                regressions = self.compare(
+                    report, json.load(baseline), options['threshold']
+                )
+            for line in regressions:
+                self.stderr.write(line)
+            if regressions:
+                raise CommandError('Есть регрессии относительно базы')
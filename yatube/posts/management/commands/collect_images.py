@@ -0,0 +1,103 @@
+from datetime import timedelta
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_thumbnails
+
+from posts.models import Post, StoredImage, Thumbnail
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки постов, на которые не осталось ссылок, вместе с '
+        'их миниатюрами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=3600,
+            help='Сколько секунд файл без ссылок ещё хранится',
+        )
+        parser.add_argument(
+            '--scan', action='store_true',
+            help='Искать в хранилище файлы, которых нет в StoredImage',
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def remove(self, name):
+        """Удаляет файл, если его давно не загружали; возвращает размер."""
+        try:
+            modified = self.storage.get_modified_time(name)
+            if modified > self.cutoff:
+                return None
+            size = self.storage.size(name)
+            if not self.dry_run:
+                delete_thumbnails(name, delete_file=False)
+                Thumbnail.objects.filter(source=name).delete()
+                self.storage.delete(name)
+        except (OSError, SuspiciousFileOperation) as error:
+            self.stderr.write(f'{name}: {error}')
+            return None
+        return size
+
+    def released(self):
+        """Файлы из StoredImage без ссылок, пачками по BATCH_SIZE."""
+        candidates = StoredImage.objects.filter(
+            references=0, released__lt=self.cutoff
+        ).order_by('pk').values_list('pk', flat=True)
+        last = 0
+        while True:
+            batch = list(candidates.filter(pk__gt=last)[:BATCH_SIZE])
+            if not batch:
+                return
+            last = batch[-1]
+            with transaction.atomic():
+                # ссылка могла появиться после выборки кандидатов
+                images = StoredImage.objects.select_for_update().filter(
+                    pk__in=batch, references=0
+                )
+                names = list(images.values_list('name', flat=True))
+                if not self.dry_run:
+                    images.delete()
+            yield from names
+
+    def untracked(self):
+        """Файлы хранилища, о которых не знает ни StoredImage, ни Post."""
+        field = Post._meta.get_field('image')
+        known = set(StoredImage.objects.values_list('name', flat=True))
+        known.update(Post.objects.values_list('image', flat=True))
+        stack = [field.upload_to.rstrip('/')]
+        while stack:
+            directory = stack.pop()
+            if not self.storage.exists(directory):
+                continue
+            directories, files = self.storage.listdir(directory)
+            stack.extend(
+                f'{directory}/{name}' for name in directories
+            )
+            for name in files:
+                name = f'{directory}/{name}'
+                if name not in known:
+                    yield name
+
+    def handle(self, *args, **options):
+        self.storage = Post._meta.get_field('image').storage
+        self.cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        self.dry_run = options['dry_run']
+        names = list(self.released())
+        if options['scan']:
+            names += list(self.untracked())
+        removed, freed = 0, 0
+        for name in names:
+            size = self.remove(name)
+            if size is not None:
+                removed += 1
+                freed += size
+        verb = 'Будет удалено' if self.dry_run else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} файлов: {removed}, {freed / 1024 / 1024:.1f} МБ'
+        ))
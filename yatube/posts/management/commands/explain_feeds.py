@@ -0,0 +1,94 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts import timeline
+from posts.models import Comment, Follow, Post, TimelineEntry
+from posts.seeding import seed
+
+PAGE = 11
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает планы и время запросов лент до и после индексов. '
+        'С --seed наполняет базу данными и откатывает их в конце.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Сколько постов создать перед замером')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def feed_queries(self):
+        post = Post.objects.order_by('-comments_count').first()
+        follow = Follow.objects.select_related('user').first()
+        if post is None or follow is None:
+            return {}
+        return {
+            'index': Post.objects.for_feed(),
+            'group_list': Post.objects.for_feed().filter(
+                group_id=post.group_id),
+            'profile': Post.objects.for_feed().filter(
+                author_id=post.author_id),
+            'comments': Comment.objects.filter(post=post),
+            # посты звёзд читаются как profile, по индексу автора
+            'follow_index': TimelineEntry.objects.filter(
+                user_id=follow.user_id
+            ).values('pub_date', 'post_id').order_by(*timeline.ORDERING),
+            'following': Follow.objects.filter(
+                user_id=follow.user_id, author_id=follow.author_id),
+        }
+
+    def measure(self, label, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        for name, queryset in self.feed_queries().items():
+            queryset = queryset[:PAGE]
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append(time.perf_counter() - started)
+            self.stdout.write(
+                f'{name}: {statistics.median(timings) * 1000:.2f} мс'
+            )
+            self.stdout.write(self.explain(queryset, label))
+
+    def explain(self, queryset, label):
+        # метка в тексте запроса не даёт sqlite3 взять план из кеша
+        # подготовленных выражений, сделанный ещё с индексами
+        sql, params = queryset.query.sql_with_params()
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql} /* {label} */', params)
+            return '\n'.join(
+                '  ' + ' '.join(str(column) for column in row)
+                for row in cursor.fetchall()
+            )
+
+    def drop_indexes(self):
+        # schema_editor в SQLite не работает внутри транзакции,
+        # а индексы нужно вернуть откатом
+        with connection.cursor() as cursor:
+            for model in (Post, Comment, Follow, TimelineEntry):
+                for index in model._meta.indexes:
+                    cursor.execute(
+                        f'DROP INDEX {connection.ops.quote_name(index.name)}'
+                    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                seed(
+                    users=max(options['seed'] // 100, 2),
+                    groups=max(options['seed'] // 1000, 1),
+                    posts=options['seed'],
+                    comments=options['seed'] * 2,
+                    follows=options['seed'] // 10,
+                )
+            self.measure('С индексами', options['repeat'])
+            self.drop_indexes()
+            self.measure('Без индексов', options['repeat'])
+            transaction.set_rollback(True)
@@ -0,0 +1,64 @@
+import argparse
+import sys
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from posts.exporting import EXPORTERS, WRITERS, export
+
+
+def _when(value):
+    """Дата или дата со временем из аргумента командной строки."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise argparse.ArgumentTypeError(
+                f'не удалось разобрать дату {value!r}'
+            )
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает посты (с комментариями, в формате '
+        'import_posts), комментарии или подписки в JSONL или CSV.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTERS))
+        parser.add_argument('--format', choices=sorted(WRITERS),
+                            default='jsonl')
+        parser.add_argument('--output', help='Файл; по умолчанию stdout')
+        parser.add_argument('--gzip', action='store_true',
+                            help='Сжать; включается и расширением .gz')
+        parser.add_argument('--author', help='username автора')
+        parser.add_argument('--group', help='slug группы')
+        parser.add_argument('--since', type=_when, help='Не раньше даты')
+        parser.add_argument('--until', type=_when, help='Раньше даты')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        compress = options['gzip'] or bool(output and output.endswith('.gz'))
+        chunks = export(
+            options['kind'], options['format'], gzip=compress,
+            author=options['author'], group=options['group'],
+            since=options['since'], until=options['until'],
+        )
+        if output:
+            mode = 'wb' if compress else 'w'
+            encoding = None if compress else 'utf-8'
+            newline = None if compress else ''
+            with open(output, mode, encoding=encoding,
+                      newline=newline) as file:
+                file.writelines(chunks)
+        elif compress:
+            sys.stdout.buffer.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,38 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_sets, missing_sets
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует наборы миниатюр ленты для srcset пулом процессов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов; 1 — генерировать в текущем',
+        )
+
+    def handle(self, *args, **options):
+        images = missing_sets(
+            Post.objects.exclude(image='').order_by().values_list(
+                'image', 'image_width'
+            ).distinct()
+        )
+        total = len(images)
+        self.stdout.write(f'Картинок без полного набора: {total}')
+        started = time.perf_counter()
+        for done, name in enumerate(
+            generate_sets(images, options['workers']), 1
+        ):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'[{done}/{total}] {name}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово картинок: {total} за '
+            f'{time.perf_counter() - started:.1f} с'
+        ))
@@ -0,0 +1,77 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importing import BATCH_SIZE, Importer, read_csv, read_jsonl
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv}
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты и комментарии из JSONL или CSV пачками через '
+        'bulk_create. В JSONL у поста может быть список comments.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл, .gz или - для stdin')
+        parser.add_argument('--format', choices=sorted(READERS),
+                            help='По умолчанию по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--create-missing', action='store_true',
+                            help='Создавать неизвестных авторов и группы')
+        parser.add_argument('--images-dir',
+                            help='Откуда копировать файлы из поля image')
+        parser.add_argument('--encoding', default='utf-8')
+
+    def _format(self, path, chosen):
+        if chosen:
+            return chosen
+        name = path[:-len('.gz')] if path.endswith('.gz') else path
+        for extension in READERS:
+            if name.endswith(f'.{extension}'):
+                return extension
+        raise CommandError('Не удалось определить формат: укажите --format')
+
+    def _open(self, path, encoding):
+        if path == '-':
+            return sys.stdin
+        opener = gzip.open if path.endswith('.gz') else open
+        try:
+            return opener(path, 'rt', encoding=encoding, newline='')
+        except OSError as error:
+            raise CommandError(error)
+
+    def _progress(self, importer):
+        self.stdout.write(
+            f'Постов: {importer.counts["posts"]}, '
+            f'{importer.rate:.0f} записей/с'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        path = options['path']
+        reader = READERS[self._format(path, options['format'])]
+        importer = Importer(
+            batch_size=options['batch_size'],
+            create_missing=options['create_missing'],
+            images_dir=options['images_dir'],
+            warn=lambda message: self.stderr.write(message),
+            progress=(
+                self._progress if options['verbosity'] > 1 else None
+            ),
+        )
+        stream = self._open(path, options['encoding'])
+        try:
+            counts = importer.run(reader(stream))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано постов: {counts["posts"]}, '
+            f'комментариев: {counts["comments"]}, '
+            f'пропущено записей: {counts["skipped"]} '
+            f'за {importer.elapsed:.1f} с ({importer.rate:.0f} записей/с)'
+        ))
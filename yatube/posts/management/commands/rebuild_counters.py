@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post, StoredImage, UserStats
+
+User = get_user_model()
+
+
+def _count(queryset, field, key='pk'):
+    """Подзапрос COUNT(*) по полю field, равному OuterRef(key)."""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef(key)})
+        .order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики постов, подписок и '
+        'ссылок на картинки'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            UserStats.objects.bulk_create(
+                [UserStats(user_id=pk) for pk in User.objects.filter(
+                    stats__isnull=True).values_list('pk', flat=True)],
+            )
+            users = UserStats.objects.update(
+                posts_count=_count(Post.objects, 'author'),
+                followers_count=_count(Follow.objects, 'author'),
+                following_count=_count(Follow.objects, 'user'),
+            )
+            groups = Group.objects.update(
+                posts_count=_count(Post.objects, 'group'),
+            )
+            posts = Post.objects.update(
+                comments_count=_count(Comment.objects, 'post'),
+            )
+            StoredImage.objects.bulk_create(
+                [StoredImage(name=name) for name in Post.objects.exclude(
+                    image='',
+                ).exclude(
+                    image__in=StoredImage.objects.values('name'),
+                ).values_list('image', flat=True).distinct()],
+            )
+            images = StoredImage.objects.update(
+                references=_count(Post.objects, 'image', 'name'),
+            )
+            StoredImage.objects.filter(
+                references=0, released__isnull=True
+            ).update(released=timezone.now())
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано: пользователей {users}, групп {groups}, '
+            f'постов {posts}, картинок {images}'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.search import index_post
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс по всем постам'
+
+    def handle(self, *args, **options):
+        indexed = 0
+        for post in Post.objects.only('text').iterator(chunk_size=500):
+            index_post(post)
+            indexed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {indexed}'
+        ))
@@ -0,0 +1,139 @@
+import os
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Group, Post
+from posts.thumbnails import generate_sets, missing_sets
+from posts.utils import CURSOR_PARAM, CursorPaginator
+
+User = get_user_model()
+
+
+def _host():
+    """Имя хоста из ALLOWED_HOSTS, чтобы запросы прошли проверку Host."""
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*':
+            return host.lstrip('.')
+    return 'testserver'
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогревает кеш после деплоя: генерирует недостающие миниатюры '
+        'свежих постов и рендерит первые страницы лент главной, групп и '
+        'авторов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=int, default=1,
+            help='Сколько первых страниц каждой ленты рендерить',
+        )
+        parser.add_argument(
+            '--posts', type=int,
+            help='Сколько свежих постов каждой ленты обойти ради миниатюр; '
+                 'по умолчанию все посты прогреваемых страниц',
+        )
+        parser.add_argument(
+            '--feeds', type=int, default=100,
+            help='Сколько самых активных групп и авторов прогревать',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов для миниатюр; 1 — в текущем',
+        )
+
+    def feeds(self, limit):
+        """Адрес и queryset постов каждой ленты, свежие ленты первыми."""
+        feeds = [(reverse('posts:index'), Post.objects.all())]
+        groups = Group.objects.annotate(
+            latest=Max('posts__pub_date')
+        ).filter(latest__isnull=False).order_by('-latest')[:limit]
+        feeds += [
+            (reverse('posts:group_list', args=[group.slug]),
+             group.posts.all())
+            for group in groups
+        ]
+        authors = User.objects.annotate(
+            latest=Max('posts__pub_date')
+        ).filter(latest__isnull=False).order_by('-latest')[:limit]
+        feeds += [
+            (reverse('posts:profile', args=[author.username]),
+             author.posts.all())
+            for author in authors
+        ]
+        return feeds
+
+    def warm_thumbnails(self, feeds, posts, workers):
+        images = {}
+        for _, queryset in feeds:
+            images.update(
+                queryset.exclude(image='').values_list(
+                    'image', 'image_width'
+                )[:posts]
+            )
+        images = missing_sets(images.items())
+        total = len(images)
+        started = time.perf_counter()
+        for done, name in enumerate(generate_sets(images, workers), 1):
+            if self.verbosity > 1:
+                self.stdout.write(f'[{done}/{total}] {name}')
+        self.stdout.write(
+            f'Миниатюры: {total} картинок за '
+            f'{time.perf_counter() - started:.1f} с'
+        )
+
+    def urls(self, url, queryset, pages):
+        """Адреса первых pages страниц ленты по курсорам."""
+        paginator = CursorPaginator(queryset, settings.POST_PER_PAGE)
+        cursor = None
+        for _ in range(pages):
+            yield url if cursor is None else (
+                f'{url}?{urlencode({CURSOR_PARAM: cursor})}'
+            )
+            cursor = paginator.page(cursor).next_cursor
+            if cursor is None:
+                return
+
+    def warm_pages(self, feeds, pages):
+        client = Client(SERVER_NAME=_host())
+        urls = [
+            page_url for url, queryset in feeds
+            for page_url in self.urls(url, queryset, pages)
+        ]
+        timings = []
+        for done, url in enumerate(urls, 1):
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                self.stderr.write(f'{url}: {response.status_code}')
+            elif self.verbosity > 1:
+                self.stdout.write(
+                    f'[{done}/{len(urls)}] {url} '
+                    f'{timings[-1] * 1000:.1f} мс'
+                )
+        slowest = max(timings, default=0)
+        self.stdout.write(
+            f'Страницы: {len(urls)} за {sum(timings):.1f} с, самая '
+            f'медленная {slowest * 1000:.1f} мс'
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        started = time.perf_counter()
+        feeds = self.feeds(options['feeds'])
+        self.stdout.write(f'Лент: {len(feeds)}')
+        posts = options['posts'] or options['pages'] * settings.POST_PER_PAGE
+        self.warm_thumbnails(feeds, posts, options['workers'])
+        self.warm_pages(feeds, options['pages'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Кеш прогрет за {time.perf_counter() - started:.1f} с'
+        ))
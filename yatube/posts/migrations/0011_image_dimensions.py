@@ -0,0 +1,42 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:23
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+from PIL import Image
+
+
+def backfill_dimensions(apps, schema_editor):
+    # Pillow читает только заголовок; пропавшие и битые файлы пропускаем
+    Post = apps.get_model('posts', 'Post')
+    posts = []
+    for post in Post.objects.exclude(image='').only('image').iterator():
+        try:
+            with default_storage.open(post.image.name) as source:
+                post.image_width, post.image_height = Image.open(source).size
+        except (OSError, ValueError):
+            continue
+        posts.append(post)
+    Post.objects.bulk_update(
+        posts, ['image_width', 'image_height'], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_versioning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_dimensions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,200 @@
+"""Полнотекстовый поиск по постам на собственном инвертированном индексе.
+
+Текст поста разбивается на слова, русские слова приводятся к основе
+стеммером Snowball, и пары (основа, пост) с числом вхождений хранятся в
+PostTerm. Индекс обновляется сигналом при сохранении поста.
+"""
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.db import transaction
+from django.db.models import (Case, Count, F, IntegerField, Max, Sum, Value,
+                              When)
+
+from .models import Post, PostTerm
+
+WORD_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+# вес каждого совпавшего слова запроса больше любого TF-IDF вклада,
+# поэтому посты со всеми словами запроса всегда выше
+MATCH_WEIGHT = 10 ** 9
+IDF_SCALE = 1000
+
+STOP_WORDS = frozenset((
+    'а', 'без', 'бы', 'был', 'была', 'были', 'было', 'быть', 'в', 'вам',
+    'вас', 'во', 'вот', 'все', 'всё', 'вы', 'где', 'да', 'для', 'до',
+    'его', 'ее', 'её', 'ей', 'если', 'есть', 'еще', 'ещё', 'же', 'за',
+    'и', 'из', 'или', 'им', 'их', 'к', 'как', 'когда', 'кто', 'ли', 'мне',
+    'мы', 'на', 'над', 'не', 'нет', 'ни', 'но', 'о', 'об', 'он', 'она',
+    'они', 'от', 'по', 'под', 'при', 'про', 'с', 'со', 'так', 'там', 'то',
+    'тоже', 'только', 'ты', 'у', 'уже', 'что', 'чтобы', 'это', 'этот',
+    'я',
+))
+
+
+def _candidates(preceded, plain):
+    """Окончания группы от длинных к коротким с признаком «после а/я»."""
+    candidates = [(suffix, True) for suffix in preceded]
+    candidates += [(suffix, False) for suffix in plain]
+    candidates.sort(key=lambda item: len(item[0]), reverse=True)
+    return tuple(candidates)
+
+
+VOWELS = 'аеиоуыэюя'
+PERFECTIVE_GERUND = _candidates(
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = _candidates(
+    (),
+    ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+     'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+     'ая', 'яя', 'ою', 'ею'),
+)
+PARTICIPLE = _candidates(
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = _candidates((), ('ся', 'сь'))
+VERB = _candidates(
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = _candidates(
+    (),
+    ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+     'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+     'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+     'ья', 'я'),
+)
+SUPERLATIVE = _candidates((), ('ейше', 'ейш'))
+DERIVATIONAL = _candidates((), ('ость', 'ост'))
+
+
+def _region(word, start):
+    """Начало области после первой согласной, идущей за гласной."""
+    for i in range(max(start, 1), len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _strip(word, start, candidates):
+    """Снимает самое длинное окончание из candidates, лежащее после start.
+
+    Окончания первой группы снимаются, только если перед ними «а» или
+    «я». Возвращает None, если окончание не найдено.
+    """
+    for suffix, needs_a in candidates:
+        if not word.endswith(suffix) or len(word) - len(suffix) < start:
+            continue
+        stem = word[:-len(suffix)]
+        if needs_a and not (len(stem) > start and stem[-1] in 'ая'):
+            return None
+        return stem
+    return None
+
+
+@lru_cache(maxsize=100000)
+def stem(word):
+    """Основа русского слова по алгоритму Snowball."""
+    word = word.replace('ё', 'е')
+    rv = next(
+        (i + 1 for i, char in enumerate(word) if char in VOWELS), len(word)
+    )
+    r2 = _region(word, _region(word, 1))
+
+    stemmed = _strip(word, rv, PERFECTIVE_GERUND)
+    if stemmed is None:
+        word = _strip(word, rv, REFLEXIVE) or word
+        stemmed = _strip(word, rv, ADJECTIVE)
+        if stemmed is not None:
+            stemmed = _strip(stemmed, rv, PARTICIPLE) or stemmed
+        else:
+            stemmed = _strip(word, rv, VERB)
+            if stemmed is None:
+                stemmed = _strip(word, rv, NOUN)
+    word = stemmed if stemmed is not None else word
+
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    word = _strip(word, r2, DERIVATIONAL) or word
+
+    if word.endswith('нн') and len(word) - 1 >= rv:
+        return word[:-1]
+    superlative = _strip(word, rv, SUPERLATIVE)
+    if superlative is not None:
+        word = superlative
+        if word.endswith('нн') and len(word) - 1 >= rv:
+            word = word[:-1]
+        return word
+    if word.endswith('ь') and len(word) - 1 >= rv:
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Основы слов текста без стоп-слов и однобуквенных слов."""
+    terms = []
+    for word in WORD_RE.findall(text.lower()):
+        if len(word) < 2 or word in STOP_WORDS or word.isdigit():
+            continue
+        if any('а' <= char <= 'я' or char == 'ё' for char in word):
+            word = stem(word)
+        terms.append(word[:MAX_TERM_LENGTH])
+    return terms
+
+
+def entries(post):
+    """Несохранённые записи индекса для текста поста."""
+    return [
+        PostTerm(post_id=post.pk, term=term, count=count)
+        for term, count in Counter(tokenize(post.text)).items()
+    ]
+
+
+def index_post(post):
+    """Перестраивает записи индекса для одного поста."""
+    with transaction.atomic():
+        PostTerm.objects.filter(post_id=post.pk).delete()
+        PostTerm.objects.bulk_create(entries(post))
+
+
+def _nothing():
+    return Post.objects.none().annotate(
+        rank=Value(0, output_field=IntegerField())
+    )
+
+
+def search(query):
+    """Посты, найденные по запросу, с аннотацией rank для сортировки."""
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return _nothing()
+    # число постов оцениваем по максимальному id: это поиск по индексу,
+    # а не COUNT(*); для IDF такой точности хватает
+    total = Post.objects.aggregate(top=Max('pk'))['top'] or 1
+    frequencies = dict(
+        PostTerm.objects.filter(term__in=terms)
+        .values_list('term').annotate(df=Count('pk'))
+    )
+    weights = [
+        When(terms__term=term, then=F('terms__count') * int(
+            IDF_SCALE * math.log((total + 1) / (frequency + 1)) + 1
+        ))
+        for term, frequency in frequencies.items()
+    ]
+    if not weights:
+        return _nothing()
+    return Post.objects.for_feed().filter(
+        terms__term__in=terms
+    ).annotate(
+        rank=Count('terms') * MATCH_WEIGHT + Sum(
+            Case(*weights, default=0, output_field=IntegerField())
+        )
+    )
@@ -0,0 +1,74 @@
+"""Наполнение базы синтетическими данными для бенчмарков.
+
+Строки вставляются через bulk_create в обход сигналов, поэтому после
+вставки счётчики, поисковый индекс и ленты подписок пересобираются
+отдельно.
+"""
+import random
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+from . import timeline
+from .models import Comment, Follow, Group, Post
+from .utils import bulk_insert
+
+User = get_user_model()
+
+
+def _ids(model, prefix_field, prefix):
+    return list(
+        model.objects.filter(**{f'{prefix_field}__startswith': prefix})
+        .values_list('pk', flat=True)
+    )
+
+
+def seed(users=100, groups=10, posts=10000, comments=20000, follows=1000,
+         random_seed=0, prefix='bench'):
+    """Создаёт пользователей, группы, посты, комментарии и подписки."""
+    rnd = random.Random(random_seed)
+    bulk_insert(
+        User,
+        (User(username=f'{prefix}_user_{i}', first_name='Имя',
+              last_name=f'Фамилия {i}') for i in range(users)),
+    )
+    bulk_insert(
+        Group,
+        (Group(title=f'Группа {i}', slug=f'{prefix}-group-{i}',
+               description='Описание') for i in range(groups)),
+    )
+    user_ids = _ids(User, 'username', f'{prefix}_user_')
+    group_ids = _ids(Group, 'slug', f'{prefix}-group-')
+    bulk_insert(
+        Post,
+        (Post(text=f'Текст поста {i} ' * 10,
+              author_id=rnd.choice(user_ids),
+              group_id=rnd.choice(group_ids + [None]))
+         for i in range(posts)),
+    )
+    post_ids = list(
+        Post.objects.filter(author_id__in=user_ids)
+        .values_list('pk', flat=True)
+    )
+    bulk_insert(
+        Comment,
+        (Comment(text=f'Комментарий {i}',
+                 author_id=rnd.choice(user_ids),
+                 post_id=rnd.choice(post_ids))
+         for i in range(comments if post_ids else 0)),
+    )
+    pairs = set()
+    if len(user_ids) > 1:
+        pairs = {tuple(rnd.sample(user_ids, 2)) for _ in range(follows)}
+    bulk_insert(
+        Follow,
+        (Follow(user_id=user_id, author_id=author_id)
+         for user_id, author_id in pairs),
+        ignore_conflicts=True,
+    )
+    call_command('rebuild_counters', stdout=StringIO())
+    call_command('rebuild_search_index', stdout=StringIO())
+    for follow in Follow.objects.filter(user_id__in=user_ids).iterator():
+        timeline.backfill(follow)
+    return user_ids, group_ids, post_ids
@@ -0,0 +1,109 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import search, timeline
+from .caching import bump_feed_generation
+from .models import Comment, Follow, Group, Post, StoredImage, UserStats
+
+
+def _bump(model, pk, **deltas):
+    if pk is None:
+        return
+    model.objects.filter(pk=pk).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def _bump_user(user_id, **deltas):
+    with transaction.atomic():
+        UserStats.objects.get_or_create(user_id=user_id)
+        _bump(UserStats, user_id, **deltas)
+
+
+def _reference_image(name, delta):
+    if not name:
+        return
+    with transaction.atomic():
+        StoredImage.objects.get_or_create(name=name)
+        images = StoredImage.objects.filter(name=name)
+        images.update(references=F('references') + delta, released=None)
+        if delta < 0:
+            images.filter(references=0).update(released=timezone.now())
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw, **kwargs):
+    if raw or instance._state.adding:
+        return
+    instance._previous_group_id, instance._previous_image = (
+        Post.objects.filter(pk=instance.pk)
+        .values_list('group_id', 'image').first()
+    ) or (None, '')
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    bump_feed_generation()
+    with transaction.atomic():
+        if created:
+            _bump_user(instance.author_id, posts_count=1)
+            _bump(Group, instance.group_id, posts_count=1)
+            _reference_image(instance.image.name, 1)
+            timeline.fan_out(instance)
+            return
+        previous = getattr(instance, '_previous_group_id', None)
+        if previous != instance.group_id:
+            _bump(Group, previous, posts_count=-1)
+            _bump(Group, instance.group_id, posts_count=1)
+        previous = getattr(instance, '_previous_image', '')
+        if previous != instance.image.name:
+            _reference_image(previous, -1)
+            _reference_image(instance.image.name, 1)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, raw, **kwargs):
+    if not raw:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    bump_feed_generation()
+    with transaction.atomic():
+        _bump(UserStats, instance.author_id, posts_count=-1)
+        _bump(Group, instance.group_id, posts_count=-1)
+        _reference_image(instance.image.name, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        _bump(Post, instance.post_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    _bump(Post, instance.post_id, comments_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        with transaction.atomic():
+            _bump_user(instance.user_id, following_count=1)
+            _bump_user(instance.author_id, followers_count=1)
+            timeline.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    with transaction.atomic():
+        _bump(UserStats, instance.user_id, following_count=-1)
+        _bump(UserStats, instance.author_id, followers_count=-1)
+        timeline.prune(instance)
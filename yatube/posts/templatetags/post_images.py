@@ -0,0 +1,23 @@
+from django import template
+
+from ..thumbnails import feed_image as _feed_image
+from ..thumbnails import feed_image_url as _feed_image_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def feed_image_url(image):
+    return _feed_image_url(image)
+
+
+@register.simple_tag(takes_context=True)
+def feed_image(context, image):
+    """Картинка ленты: src, srcset, webp_srcset и sizes.
+
+    Берётся из feed_images контекста, если view загрузил их для страницы.
+    """
+    images = context.get('feed_images', {})
+    if image and image.name in images:
+        return images[image.name]
+    return _feed_image(image)
@@ -1,22 +1,36 @@
+import hashlib
+import os
 import shutil
 import tempfile
+from io import BytesIO, StringIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from .. import thumbnails
 from ..forms import CommentForm, PostForm
-from ..models import Comment, Group, Post
+from ..models import Comment, Group, Post, StoredImage, Thumbnail
 
 User = get_user_model()
 # временная папка для хранения изображений
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_POOL_WORKERS=0)
 class PostFormTest(TestCase):
     # создать тестовую группу и пост
     @classmethod
@@ -77,17 +91,9 @@ class PostFormTest(TestCase):
     def test_post_with_img(self):
         """Тестируем создание поста с картинкой."""
         post_count = Post.objects.count()
-        small_gif = (
-            b'\x47\x49\x46\x38\x39\x61\x02\x00'
-            b'\x01\x00\x80\x00\x00\x00\x00\x00'
-            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
-            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
-            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
-            b'\x0A\x00\x3B'
-        )
         uploaded = SimpleUploadedFile(
             name='small.gif',
-            content=small_gif,
+            content=SMALL_GIF,
             content_type='image/gif'
         )
         form_data = {
@@ -105,7 +111,156 @@ class PostFormTest(TestCase):
         post = Post.objects.latest('id')
         self.assertEqual(Post.objects.count(), post_count + 1)
         self.assertEqual(post.text, form_data['text'])
-        self.assertEqual(str(post.image), 'posts/small.gif')
+        with post.image.open('rb') as stored:
+            digest = hashlib.sha256(stored.read()).hexdigest()
+        self.assertEqual(str(post.image), f'posts/{digest[:2]}/{digest}.gif')
+
+    def upload(self, name, image, fmt, **options):
+        """Создаёт пост с картинкой через форму и возвращает его."""
+        content = BytesIO()
+        image.save(content, fmt, **options)
+        self.authorized_client.post(reverse('posts:post_create'), {
+            'text': 'Пост с фотографией',
+            'image': SimpleUploadedFile(name, content.getvalue()),
+        })
+        return Post.objects.latest('id')
+
+    def test_photo_is_resized_and_stripped(self):
+        """Большое фото уменьшается, теряет EXIF и хранит размеры"""
+        side = settings.POST_IMAGE_MAX_SIDE
+        exif = Image.Exif()
+        # Orientation: повернуть на 90° по часовой
+        exif[0x0112] = 6
+        post = self.upload(
+            'photo.jpeg', Image.new('RGB', (side * 2, side)), 'JPEG',
+            exif=exif,
+        )
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        self.assertEqual((post.image_width, post.image_height),
+                         (side // 2, side))
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.format, 'JPEG')
+            self.assertEqual(stored.size, (side // 2, side))
+            self.assertEqual(len(stored.getexif()), 0)
+
+    def test_transparent_png_stays_png(self):
+        post = self.upload(
+            'logo.png', Image.new('RGBA', (10, 20), (255, 0, 0, 0)), 'PNG'
+        )
+        self.assertTrue(post.image.name.endswith('.png'))
+        self.assertEqual((post.image_width, post.image_height), (10, 20))
+
+    def test_identical_uploads_share_file(self):
+        """Одинаковые картинки хранятся одним файлом до последней ссылки"""
+        image = Image.new('RGB', (30, 20), (0, 128, 0))
+        first = self.upload('first.png', image, 'PNG')
+        second = self.upload('second.png', image, 'PNG')
+        self.assertEqual(first.image.name, second.image.name)
+        stored = StoredImage.objects.get(name=first.image.name)
+        self.assertEqual(stored.references, 2)
+        first.delete()
+        second.image = ''
+        second.save()
+        stored.refresh_from_db()
+        self.assertEqual(stored.references, 0)
+        call_command('collect_images', stdout=StringIO())
+        self.assertTrue(os.path.exists(first.image.path))
+        call_command('collect_images', grace=0, stdout=StringIO())
+        self.assertFalse(os.path.exists(first.image.path))
+        self.assertFalse(StoredImage.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        post_count = Post.objects.count()
+        content = BytesIO()
+        Image.new('RGB', (20, 20)).save(content, 'PNG')
+        response = self.authorized_client.post(
+            reverse('posts:post_create'), {
+                'text': 'Пост с огромной картинкой',
+                'image': SimpleUploadedFile('huge.png', content.getvalue()),
+            }
+        )
+        self.assertEqual(Post.objects.count(), post_count)
+        self.assertFormError(
+            response, 'form', 'image',
+            'Изображение 20×20 слишком большое.'
+        )
+
+    def animation(self, size, **options):
+        frames = [Image.new('P', size, color) for color in (1, 2)]
+        return frames[0], dict(
+            save_all=True, append_images=frames[1:], duration=50, **options
+        )
+
+    def test_animation_is_reencoded(self):
+        """Анимация сохраняет кадры и теряет метаданные."""
+        first, options = self.animation((10, 20), comment=b'secret')
+        post = self.upload('anim.gif', first, 'GIF', **options)
+        self.assertTrue(post.image.name.endswith('.gif'))
+        self.assertEqual((post.image_width, post.image_height), (10, 20))
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.n_frames, 2)
+            self.assertNotIn('comment', stored.info)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=16)
+    def test_large_animation_rejected(self):
+        post_count = Post.objects.count()
+        first, options = self.animation((10, 20))
+        content = BytesIO()
+        first.save(content, 'GIF', **options)
+        response = self.authorized_client.post(
+            reverse('posts:post_create'), {
+                'text': 'Пост с большой анимацией',
+                'image': SimpleUploadedFile('anim.gif', content.getvalue()),
+            }
+        )
+        self.assertEqual(Post.objects.count(), post_count)
+        self.assertFormError(
+            response, 'form', 'image',
+            'Анимация больше 16 пикселей по стороне.'
+        )
+
+    def test_thumbnail_is_precomputed(self):
+        """Лента отдаёт готовую миниатюру, а не исходную картинку."""
+        post = Post.objects.create(
+            author=self.author,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='thumb.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        self.assertIsNone(thumbnails.backend.get_cached(
+            post.image.name, thumbnails.FEED_GEOMETRY,
+            **thumbnails.FEED_OPTIONS
+        ))
+        thumbnails.generate(post.image.name)
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertNotContains(response, post.image.url)
+        self.assertContains(response, '<img class="card-img my-2"')
+
+    def test_thumbnail_set_in_srcset(self):
+        """Набор миниатюр не шире исходника попадает в srcset."""
+        post = self.upload('wide.jpg', Image.new('RGB', (500, 250)), 'JPEG')
+        out = StringIO()
+        call_command('generate_thumbnails', workers=1, stdout=out)
+        self.assertIn('Готово картинок: 1', out.getvalue())
+        widths = Thumbnail.objects.filter(
+            source=post.image.name, format='JPEG'
+        ).values_list('width', flat=True)
+        self.assertEqual(sorted(widths), [320, 480, 960])
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        image = response.context['image']
+        self.assertIn('320w', image.srcset)
+        self.assertIn('960w', image.srcset)
+        self.assertTrue(image.src.endswith('.jpg'))
+        self.assertContains(response, f'sizes="{thumbnails.SIZES}"')
+        out = StringIO()
+        call_command('generate_thumbnails', workers=1, stdout=out)
+        self.assertIn('Картинок без полного набора: 0', out.getvalue())
 
     def test_post_with_non_img(self):
         """
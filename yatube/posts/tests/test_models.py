@@ -1,8 +1,15 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Comment, Group, Post
+from .. import search
+from ..models import Comment, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
@@ -43,3 +50,176 @@ class PostModelTest(TestCase):
         for model, name in expected_names.items():
             with self.subTest(model=model):
                 self.assertEqual(str(model), name)
+
+
+class VersionedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+
+    def test_save_bumps_version(self):
+        """Каждое сохранение увеличивает версию и время правки"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            author=self.author, post=post, text='Комментарий'
+        )
+        for obj in (post, comment):
+            with self.subTest(model=type(obj).__name__):
+                self.assertEqual(obj.version, 1)
+                created = obj.updated_at
+                obj.text = 'Правка'
+                obj.save()
+                self.assertEqual(obj.version, 2)
+                obj.save(update_fields=['text'])
+                obj.refresh_from_db()
+                self.assertEqual(obj.version, 3)
+                self.assertGreater(obj.updated_at, created)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Другое описание',
+        )
+
+    def assertCounters(self, author_posts, group_posts, followers):
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count,
+            author_posts,
+        )
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, group_posts)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count,
+            followers,
+        )
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании, правке и удалении"""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        Comment.objects.create(author=self.reader, post=post, text='Да')
+        Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1
+        )
+        self.assertCounters(author_posts=1, group_posts=1, followers=1)
+        post.group = self.other_group
+        post.save()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.other_group.posts_count, 1)
+        self.assertCounters(author_posts=1, group_posts=0, followers=1)
+        Follow.objects.filter(user=self.reader).delete()
+        post.delete()
+        self.assertCounters(author_posts=0, group_posts=0, followers=0)
+
+    def test_rebuild_counters_command(self):
+        """Команда rebuild_counters исправляет рассинхронизацию"""
+        Post.objects.create(author=self.author, text='Пост', group=self.group)
+        UserStats.objects.update(posts_count=100)
+        Group.objects.update(posts_count=100)
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertCounters(author_posts=1, group_posts=1, followers=0)
+
+
+class ExplainFeedsTest(TestCase):
+    def test_explain_feeds_rolls_back_seed(self):
+        """explain_feeds сравнивает планы и не оставляет данных"""
+        out = StringIO()
+        call_command('explain_feeds', seed=200, repeat=1, stdout=out)
+        self.assertIn('post_pub_date_idx', out.getvalue())
+        self.assertFalse(Post.objects.exists())
+
+
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+        return path
+
+    def test_import_jsonl(self):
+        """JSONL импортируется пачками вместе с индексом и лентами"""
+        records = [
+            {'author': 'auth', 'text': 'Старый пост про море',
+             'group': 'test-slug', 'pub_date': '2015-03-01T10:00:00',
+             'comments': [
+                 {'author': 'reader', 'text': 'Первый',
+                  'created': '2015-03-02T10:00:00'},
+                 {'author': 'nobody', 'text': 'Пропущенный'},
+             ]},
+            {'author': 'nobody', 'text': 'Неизвестный автор'},
+            {'author': 'auth', 'text': 'Второй пост'},
+            {'author': 'auth', 'text': ''},
+        ]
+        path = self.write(
+            'posts.jsonl',
+            [json.dumps(record) for record in records] + ['{не json'],
+        )
+        out, err = StringIO(), StringIO()
+        call_command('import_posts', path, batch_size=2,
+                     stdout=out, stderr=err)
+        self.assertIn('Импортировано постов: 2', out.getvalue())
+        self.assertEqual(err.getvalue().count('пропущена'), 3)
+        self.assertFalse(User.objects.filter(username='nobody').exists())
+        post = Post.objects.get(text='Старый пост про море')
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.comments.get().created.day, 2)
+        self.assertEqual(self.author.stats.posts_count, 2)
+        self.assertEqual(
+            Group.objects.get(pk=self.group.pk).posts_count, 1
+        )
+        self.assertEqual(list(search.search('море')), [post])
+        self.assertEqual(self.reader.timeline.count(), 2)
+
+    def test_import_csv_creates_missing(self):
+        """CSV с --create-missing создаёт авторов и группы"""
+        path = self.write('posts.csv', [
+            'author,text,group',
+            'newcomer,Пост новичка,new-group',
+            'auth,Пост без группы,',
+        ])
+        call_command('import_posts', path, create_missing=True,
+                     stdout=StringIO(), stderr=StringIO())
+        post = Post.objects.get(author__username='newcomer')
+        self.assertEqual(post.group.slug, 'new-group')
+        self.assertFalse(post.author.has_usable_password())
+        self.assertEqual(post.author.stats.posts_count, 1)
+        self.assertTrue(
+            Post.objects.filter(author=self.author, group=None).exists()
+        )
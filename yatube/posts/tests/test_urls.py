@@ -1,9 +1,16 @@
+import json
+import tempfile
 from http import HTTPStatus
+from io import StringIO
 
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.core.management import call_command
 from django.test import Client, TestCase
 
+from api import urls as api_urls
+
+from .. import urls
 from ..models import Group, Post
 
 User = get_user_model()
@@ -98,3 +105,26 @@ class PostsURLTest(TestCase):
             with self.subTest(address=address):
                 response = self.authorized_client.get(address)
                 self.assertTemplateUsed(response, template)
+
+
+class BenchmarkTest(TestCase):
+    def test_benchmark_covers_every_route(self):
+        """benchmark_posts замеряет все страницы posts и api и пишет JSON"""
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command(
+                'benchmark_posts', users=5, groups=2, posts=30,
+                comments=30, follows=10, requests=2,
+                output=output.name, stdout=StringIO(),
+            )
+            report = json.load(output)
+        self.assertEqual(
+            set(report['routes']),
+            {pattern.name for pattern in urls.urlpatterns} | {
+                f'api:{pattern.name}' for pattern in api_urls.urlpatterns
+            },
+        )
+        for name, result in report['routes'].items():
+            with self.subTest(route=name):
+                self.assertLess(result['status'], HTTPStatus.BAD_REQUEST)
+                self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+        self.assertFalse(Post.objects.exists())
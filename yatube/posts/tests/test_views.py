@@ -1,14 +1,37 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from http import HTTPStatus
+from io import BytesIO, StringIO
+from unittest import mock
+
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_encode
+from PIL import Image
+
+from core.replicas import PIN_COOKIE, ReplicaRouter
 
-from ..models import Follow, Group, Post
+from .. import thumbnails
+from ..models import (Comment, Follow, Group, Post, Thumbnail,
+                      TimelineEntry)
 
 User = get_user_model()
 POST_TEST_OFFSET = settings.POST_PER_PAGE + 1
+FEED_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
 class PostsViewsTest(TestCase):
@@ -42,20 +65,20 @@ class PostsViewsTest(TestCase):
         cache.clear()
 
     def test_cache_index(self):
-        """Тестируем работу кеша на главное странице"""
+        """Главная отдаётся из кеша и сразу сбрасывается при удалении"""
         post = Post.objects.create(
             author=self.author,
             group=self.group,
             text='cache text',
         )
-        add = self.authorized_client.get(reverse('posts:index'))
+        add = self.guest_client.get(reverse('posts:index'))
         self.assertIn(post.text, str(add.content))
+        with self.assertNumQueries(0):
+            cached = self.guest_client.get(reverse('posts:index')).content
+        self.assertIn(post.text, str(cached))
         post.delete()
-        delete = self.authorized_client.get(reverse('posts:index')).content
-        self.assertIn(post.text, str(delete))
-        cache.clear()
-        clr = self.authorized_client.get(reverse('posts:index')).content
-        self.assertNotIn(post.text, str(clr))
+        delete = self.guest_client.get(reverse('posts:index')).content
+        self.assertNotIn(post.text, str(delete))
 
     def test_pages_uses_correct_template(self):
         """Открываются правильные шаблоны"""
@@ -240,6 +263,80 @@ class FollowIndex(TestCase):
         Follow.objects.filter(user=self.user_1, author=self.author).delete()
         self.assertEqual(follow_count - 1, Follow.objects.count())
 
+    def test_timeline_fan_out_and_prune(self):
+        """Посты раскладываются подписчикам и убираются при отписке"""
+        self.authorized_user_1.get(reverse('posts:profile_follow',
+                                           kwargs={
+                                               'username': self.author
+                                           }))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user_1, post=self.post).exists())
+        new_post = Post.objects.create(text='fan out', author=self.author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user_1, post=new_post).exists())
+        self.authorized_user_1.get(reverse('posts:profile_unfollow',
+                                           kwargs={
+                                               'username': self.author
+                                           }))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user_1).exists()
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_timeline_celebrity_read_fallback(self):
+        """Посты популярных авторов подмешиваются при чтении"""
+        self.authorized_user_1.get(reverse('posts:profile_follow',
+                                           kwargs={
+                                               'username': self.author
+                                           }))
+        Post.objects.create(text='celebrity', author=self.author)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user_1).exists()
+        )
+        response = self.authorized_user_1.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    @override_settings(TIMELINE_MAX_LENGTH=2)
+    def test_timeline_is_trimmed(self):
+        """В ленте хранятся только последние TIMELINE_MAX_LENGTH постов"""
+        Follow.objects.create(user=self.user_1, author=self.author)
+        posts = [
+            Post.objects.create(text=f'post {i}', author=self.author)
+            for i in range(3)
+        ]
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=self.user_1
+            ).values_list('post_id', flat=True)),
+            {posts[1].pk, posts[2].pk},
+        )
+
+    def test_timeline_celebrity_demoted(self):
+        """Автор ниже порога: его посты без рассылки попадают в ленты"""
+        Follow.objects.create(user=self.user_1, author=self.author)
+        with override_settings(TIMELINE_FANOUT_LIMIT=1):
+            Follow.objects.create(user=self.user_2, author=self.author)
+            post = Post.objects.create(text='celebrity', author=self.author)
+            response = self.authorized_user_1.get(
+                reverse('posts:follow_index')
+            )
+            # пост из ленты и тот же пост звезды показываются один раз
+            self.assertEqual(len(response.context['page_obj']), 2)
+            self.assertFalse(TimelineEntry.objects.filter(
+                post=post, user=self.user_1
+            ).exists())
+            with mock.patch.object(transaction, 'on_commit') as on_commit:
+                Follow.objects.filter(user=self.user_2).delete()
+            # раскладка идёт после коммита, а не в запросе отписки
+            self.assertFalse(TimelineEntry.objects.filter(
+                post=post, user=self.user_1
+            ).exists())
+            for (callback,), _ in on_commit.call_args_list:
+                callback()
+        self.assertTrue(TimelineEntry.objects.filter(
+            post=post, user=self.user_1
+        ).exists())
+
 
 class PaginatorTest(TestCase):
     @classmethod
@@ -281,7 +378,7 @@ class PaginatorTest(TestCase):
 
     def test_paginator_cache(self):
         """
-        Тестируем работу кеша в пагинаторе.
+        Удалённый пост сразу пропадает из закешированной страницы.
         """
         self.post.append(Post.objects.create(
             text='cache post',
@@ -297,7 +394,543 @@ class PaginatorTest(TestCase):
             group=self.group,
         ).delete()
         response_del = self.guest_client.get(reverse('posts:index'))
-        self.assertIn(post.text, str(response_del.content))
+        self.assertNotIn(post.text, str(response_del.content))
+
+    def test_cache_key_ignores_other_params(self):
+        """Посторонние параметры и битый курсор читают ту же страницу"""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        for params in ({'utm_source': 'mail'}, {'x': 1}, {'x': 2},
+                       {'cursor': 'junk'}):
+            with self.subTest(params=params):
+                with self.assertNumQueries(0):
+                    self.guest_client.get(url, params)
+        response = self.guest_client.get(url, {'page': 2})
+        self.assertEqual(
+            len(response.context['page_obj']),
+            POST_TEST_OFFSET - settings.POST_PER_PAGE,
+        )
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(text=f'Cursor post {i}', author=cls.author)
+            for i in range(POST_TEST_OFFSET + settings.POST_PER_PAGE)
+        )
+
+    def setUp(self) -> None:
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_cursor_pages_cover_all_posts(self):
+        """Курсорная пагинация проходит все посты без повторов"""
+        url = reverse('posts:profile', kwargs={'username': self.author})
+        response = self.guest_client.get(url)
+        page_obj = response.context['page_obj']
+        self.assertIsNone(page_obj.previous_cursor)
+        seen = [post.pk for post in page_obj]
+        while page_obj.next_cursor:
+            response = self.guest_client.get(
+                url, {'cursor': page_obj.next_cursor}
+            )
+            page_obj = response.context['page_obj']
+            seen.extend(post.pk for post in page_obj)
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk')
+            .values_list('pk', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_cursor_previous_page(self):
+        """Токен previous возвращает на предыдущую страницу"""
+        url = reverse('posts:index')
+        first = self.guest_client.get(url).context['page_obj']
+        cache.clear()
+        second = self.guest_client.get(
+            url, {'cursor': first.next_cursor}
+        ).context['page_obj']
+        cache.clear()
+        back = self.guest_client.get(
+            url, {'cursor': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertIsNone(back.previous_cursor)
+
+    def test_cursor_page_without_count(self):
+        """Страница по курсору не выполняет COUNT(*)"""
+        url = reverse('posts:profile', kwargs={'username': self.author})
+        cursor = self.guest_client.get(url).context['page_obj'].next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(url, {'cursor': cursor})
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries)
+        )
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Битый токен отдаёт первую страницу"""
+        url = reverse('posts:profile', kwargs={'username': self.author})
+        response = self.guest_client.get(url, {'cursor': 'broken'})
+        self.assertEqual(len(response.context['page_obj']),
+                         settings.POST_PER_PAGE)
+
+    def test_crafted_cursor_returns_first_page(self):
+        """Токен с неверными значениями не роняет страницу"""
+        payloads = (
+            ['n', 5], ['n', [None, 1]], ['n', [[1], 1]], ['n', 'ab'], 'n',
+        )
+        urls = (
+            reverse('posts:index'),
+            reverse('api:index'),
+            reverse('posts:post_comments', args=[Post.objects.first().pk]),
+        )
+        for payload in payloads:
+            cursor = urlsafe_base64_encode(json.dumps(payload).encode())
+            for url in urls:
+                with self.subTest(payload=payload, url=url):
+                    response = self.guest_client.get(url, {'cursor': cursor})
+                    self.assertLess(response.status_code, 500)
+
+
+@override_settings(MEDIA_ROOT=FEED_MEDIA_ROOT)
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(settings.POST_PER_PAGE):
+            post = Post.objects.create(
+                text=f'Feed post {i}',
+                author=cls.author,
+                group=cls.group,
+                image=cls.image(i) if i % 2 else None,
+            )
+            # у половины картинок набор уже есть, у остальных ещё нет
+            if i % 4 == 1:
+                Thumbnail.objects.bulk_create(
+                    Thumbnail(source=post.image.name, format=fmt,
+                              width=width, height=width // 3,
+                              name=f'cache/{i}/{fmt}/{width}')
+                    for fmt in thumbnails.SET_FORMATS
+                    for width in thumbnails.set_widths(post.image_width)
+                )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(FEED_MEDIA_ROOT, ignore_errors=True)
+
+    @staticmethod
+    def image(color):
+        content = BytesIO()
+        Image.new('RGB', (4, 2), (color, 0, 0)).save(content, 'GIF')
+        return SimpleUploadedFile('feed.gif', content.getvalue())
+
+    def setUp(self) -> None:
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def test_feed_query_budget(self):
+        """Число запросов на страницу ленты не зависит от числа постов"""
+        # два запроса на картинки: наборы и миниатюры старых постов
+        pages = (
+            (self.guest_client, reverse('posts:index'), 3),
+            (self.guest_client, reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}
+            ), 5),
+            (self.guest_client, reverse(
+                'posts:profile', kwargs={'username': self.author}
+            ), 5),
+            (self.authorized_client, reverse('posts:follow_index'), 7),
+        )
+        with mock.patch.object(thumbnails, 'generate_set') as generate:
+            for client, url, budget in pages:
+                cache.clear()
+                with self.subTest(url=url):
+                    with self.assertNumQueries(budget):
+                        client.get(url)
+            # наборы и их отсутствие закешированы
+            with self.assertNumQueries(budget - 2):
+                client.get(url)
+        generate.assert_not_called()
+
+    def test_warm_caches(self):
+        """После прогрева первые страницы лент не выбирают посты"""
+        out = StringIO()
+        call_command('warm_caches', workers=1, stdout=out)
+        self.assertIn('Лент: 3', out.getvalue())
+        self.assertIn('Страницы: 3', out.getvalue())
+        pages = (
+            (reverse('posts:index'), 0),
+            (reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}
+            ), 2),
+            (reverse('posts:profile', kwargs={'username': self.author}), 2),
+        )
+        for url, budget in pages:
+            with self.subTest(url=url):
+                with self.assertNumQueries(budget):
+                    self.guest_client.get(url)
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.both = Post.objects.create(
+            author=cls.author, text='Рыжие коты любят рыбу',
+        )
+        cls.one = Post.objects.create(
+            author=cls.author, text='Кот спит на диване',
+        )
+        Post.objects.create(author=cls.author, text='Собака лает')
+
+    def setUp(self) -> None:
+        self.guest_client = Client()
+        cache.clear()
+
+    def search(self, query, **params):
+        return self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params}
+        ).context['page_obj']
+
+    def test_search_uses_russian_stems(self):
+        """Поиск находит другие формы слова и ранжирует по совпадениям"""
+        found = list(self.search('котом и рыбой'))
+        self.assertEqual(found, [self.both, self.one])
+
+    def test_search_index_follows_edits(self):
+        """Индекс обновляется при правке и удалении поста"""
+        post = Post.objects.get(pk=self.one.pk)
+        post.text = 'Попугай спит'
+        post.save()
+        self.assertEqual(list(self.search('кот')), [self.both])
+        self.assertEqual(list(self.search('попугаи')), [self.one])
+        Post.objects.filter(pk=self.both.pk).delete()
+        self.assertEqual(list(self.search('рыба')), [])
+
+    @override_settings(POST_PER_PAGE=1)
+    def test_search_cursor_pagination(self):
+        """Курсор поиска ведёт на следующую страницу результатов"""
+        first = self.search('кот')
+        self.assertEqual(list(first), [self.one])
+        second = self.search('кот', cursor=first.next_cursor)
+        self.assertEqual(list(second), [self.both])
+        self.assertIsNone(second.next_cursor)
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост автора', group=cls.group
+        )
+        Comment.objects.create(
+            author=cls.reader, post=cls.post, text='Комментарий'
+        )
+        Post.objects.create(author=cls.reader, text='Пост читателя')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_archive_streams_own_posts(self):
+        """Автор скачивает сжатый архив только своих постов"""
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(reverse('posts:archive'))
+        self.assertTrue(response.streaming)
+        self.assertIn('auth-posts.jsonl.gz', response['Content-Disposition'])
+        lines = gzip.decompress(
+            b''.join(response.streaming_content)
+        ).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        record = json.loads(lines[0])
+        self.assertEqual(record['text'], 'Пост автора')
+        self.assertEqual(record['group'], 'test-slug')
+        self.assertEqual(record['comments'][0]['author'], 'reader')
+
+    def test_archive_requires_login(self):
+        response = Client().get(reverse('posts:archive'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_command_round_trips_through_import(self):
+        """Выгрузка export_posts загружается обратно import_posts"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'posts.jsonl.gz')
+        call_command('export_posts', 'posts', output=path,
+                     group='test-slug')
+        Post.objects.all().delete()
+        call_command('import_posts', path, stdout=StringIO())
+        post = Post.objects.get()
+        self.assertEqual(post.text, 'Пост автора')
+        self.assertEqual(post.pub_date, self.post.pub_date)
+        self.assertEqual(post.comments.get().author, self.reader)
+
+    def test_export_command_csv(self):
+        out = StringIO()
+        call_command('export_posts', 'follows', format='csv',
+                     author='reader', stdout=out)
+        self.assertEqual(
+            out.getvalue().splitlines(), ['user,author', 'reader,auth']
+        )
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост', group=cls.group
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.urls = (
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:group_list', args=[self.group.slug]),
+        )
+
+    def test_unchanged_pages_are_not_modified(self):
+        """Страница без изменений отвечает 304 без рендеринга шаблона"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertNotIn('Last-Modified', response)
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                self.assertEqual(response.templates, [])
+
+    def test_changes_invalidate_etag(self):
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        Comment.objects.create(
+            author=self.reader, post=self.post, text='Комментарий'
+        )
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_edit_changes_feed_etag(self):
+        """Правка старого поста меняет ETag лент"""
+        urls = self.urls[1:] + (
+            reverse('api:index'),
+            reverse('api:group_list', args=[self.group.slug]),
+        )
+        Post.objects.create(author=self.author, text='Новый', group=self.group)
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        Post.objects.filter(pk=self.post.pk).update(
+            text='Исправленный пост',
+            updated_at=timezone.now() + timedelta(minutes=1),
+        )
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_undated_changes_are_not_cached(self):
+        """Подписка и удаление комментария не дают 304 по дате"""
+        # If-Modified-Since из будущего новее любой даты на странице
+        since = 'Wed, 21 Oct 2099 07:28:00 GMT'
+        comment = Comment.objects.create(
+            author=self.reader, post=self.post, text='Комментарий'
+        )
+        self.client.force_login(self.reader)
+        etag = self.client.get(self.urls[0])['ETag']
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        comment.delete()
+        checks = (
+            (self.urls[1], {'HTTP_IF_MODIFIED_SINCE': since}),
+            (self.urls[0], {'HTTP_IF_MODIFIED_SINCE': since}),
+            (self.urls[0], {'HTTP_IF_NONE_MATCH': etag}),
+        )
+        for url, headers in checks:
+            with self.subTest(url=url, headers=headers):
+                response = self.client.get(url, **headers)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_post_etag_ignores_unrelated_posts(self):
+        """ETag поста меняется только с его версией и комментариями"""
+        url = self.urls[0]
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(author=self.reader, text='Другой пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_etag_depends_on_visitor(self):
+        """Вошедший пользователь не получает страницу гостя из кеша"""
+        etag = self.client.get(self.urls[0])['ETag']
+        self.client.force_login(self.reader)
+        response = self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Comment.objects.bulk_create(
+            Comment(
+                author=User.objects.create_user(username=f'reader{i}'),
+                post=cls.post,
+                text=f'Комментарий {i}',
+            )
+            for i in range(settings.COMMENTS_PER_PAGE + 5)
+        )
+
+    def setUp(self) -> None:
         cache.clear()
-        response_clr = self.guest_client.get(reverse('posts:index'))
-        self.assertNotIn(post.text, str(response_clr.content))
+        self.client = Client()
+
+    def test_initial_render_is_capped(self):
+        """Страница поста показывает первую порцию одним запросом"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:post_detail', args=[self.post.pk])
+            )
+        self.assertEqual(
+            len(response.context['comments']), settings.COMMENTS_PER_PAGE
+        )
+        self.assertLessEqual(len(queries), 3)
+        self.assertContains(response, 'js-more-comments')
+
+    def test_fragment_returns_next_chunk(self):
+        first = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        ).context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'cursor': first.next_cursor},
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        texts = [comment.text for comment in response.context['comments']]
+        self.assertEqual(len(texts), 5)
+        self.assertFalse(set(texts) & {c.text for c in first})
+        self.assertNotContains(response, 'js-more-comments')
+
+    def test_fragment_errors(self):
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        self.assertEqual(
+            self.client.get(url, {'cursor': 'x'}).status_code,
+            HTTPStatus.NOT_FOUND,
+        )
+        missing = reverse('posts:post_comments', args=[self.post.pk + 1])
+        self.assertEqual(
+            self.client.get(missing).status_code, HTTPStatus.NOT_FOUND
+        )
+
+
+@override_settings(REPLICA_DATABASE='default')
+class ReplicaRoutingTest(TestCase):
+    """Маршрутизация чтения; роль реплики в тестах играет сама default."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Тестовый пост', group=cls.group
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def routed_reads(self, method, url, data=None, models=None):
+        """Базы, которые роутер выбрал для чтения за время запроса."""
+        aliases = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            alias = db_for_read(router, model, **hints)
+            if models is None or model in models:
+                aliases.append(alias)
+            return alias
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', spy):
+            getattr(self.client, method)(url, data)
+        return aliases
+
+    def test_read_views_use_replica(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertIn('default', self.routed_reads('get', url))
+
+    def test_sessions_and_users_use_primary(self):
+        """Сессия и пользователь читаются из default и на страницах лент"""
+        reads = self.routed_reads(
+            'get', reverse('posts:follow_index'),
+            models=(Session, User),
+        )
+        self.assertEqual(set(reads), {None})
+
+    def test_writes_use_primary(self):
+        reads = self.routed_reads('get', reverse(
+            'posts:profile_follow', args=[self.author.username]
+        ))
+        self.assertEqual(set(reads), {None})
+
+    def test_reads_stick_to_primary_after_write(self):
+        """После записи посетитель читает свои изменения из default"""
+        self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Комментарий'},
+        )
+        self.assertIn(PIN_COOKIE, self.client.cookies)
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.assertEqual(set(self.routed_reads('get', url)), {None})
+        self.client.cookies[PIN_COOKIE] = '0'
+        self.assertIn('default', self.routed_reads('get', url))
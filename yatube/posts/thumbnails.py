@@ -0,0 +1,330 @@
+"""Миниатюры картинок постов, подготовленные заранее.
+
+Для каждой картинки генерируется набор миниатюр ленты нескольких
+ширин (и WebP, если Pillow его поддерживает), набор записывается в
+Thumbnail. Шаблоны строят из него srcset и никогда не открывают
+исходный файл во время запроса. После сохранения поста набор создаёт
+пул потоков, для всех картинок сразу — пул процессов
+(generate_thumbnails).
+"""
+import logging
+import multiprocessing
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connections, transaction
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+logger = logging.getLogger(__name__)
+
+FEED_GEOMETRY = '960x339'
+FEED_OPTIONS = {'crop': 'center', 'upscale': True}
+# ширины набора; последняя совпадает с FEED_GEOMETRY
+SET_WIDTHS = (320, 480, 640, 960)
+SET_FORMATS = ('JPEG', 'WEBP') if features.check('webp') else ('JPEG',)
+# карточка поста на всю ширину экрана до md, дальше колонка контейнера
+SIZES = '(max-width: 767px) 100vw, 720px'
+
+FeedImage = namedtuple('FeedImage', 'src srcset webp_srcset sizes')
+
+_lock = threading.Lock()
+_executor = None
+_pending = set()
+
+
+class PrecomputedThumbnailBackend(ThumbnailBackend):
+    def _thumbnail_file(self, file_, geometry_string, **options):
+        """ImageFile миниатюры с именем, как его считает get_thumbnail."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_cached(self, file_, geometry_string, **options):
+        """Готовая миниатюра из kvstore или None, без обращения к PIL."""
+        return default.kvstore.get(
+            self._thumbnail_file(file_, geometry_string, **options)
+        )
+
+    def get_cached_many(self, names, geometry_string, **options):
+        """get_cached для нескольких картинок: {имя: миниатюра или None}.
+
+        Записи cached_db kvstore читаются одним get_many и одним запросом
+        на промахи, у остальных kvstore — по одной.
+        """
+        kvstore = default.kvstore
+        if not isinstance(kvstore, cached_db_kvstore.KVStore):
+            return {
+                name: self.get_cached(name, geometry_string, **options)
+                for name in names
+            }
+        keys = {
+            add_prefix(self._thumbnail_file(
+                name, geometry_string, **options
+            ).key): name
+            for name in names
+        }
+        values = kvstore.cache.get_many(keys)
+        missing = [key for key in keys if values.get(key) is None]
+        values.update(KVStoreModel.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        found = dict.fromkeys(names)
+        for key, value in values.items():
+            if value is not None and value != cached_db_kvstore.EMPTY_VALUE:
+                found[keys[key]] = deserialize_image_file(value)
+        return found
+
+
+backend = PrecomputedThumbnailBackend()
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_POOL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def generate(name, geometry=FEED_GEOMETRY, **options):
+    return get_thumbnail(name, geometry, **{**FEED_OPTIONS, **options})
+
+
+def set_widths(image_width=None):
+    """Ширины набора: больше исходной картинки смысла нет, кроме ленты."""
+    widths = [
+        width for width in SET_WIDTHS
+        if image_width is None or width <= image_width
+    ]
+    return sorted({*widths, SET_WIDTHS[-1]})
+
+
+def _geometry(width):
+    feed_width, feed_height = map(int, FEED_GEOMETRY.split('x'))
+    return f'{width}x{round(width * feed_height / feed_width)}'
+
+
+def generate_set(name, image_width=None):
+    """Создаёт миниатюры набора, возвращает (формат, ширина, высота, имя)."""
+    rows = []
+    for fmt in SET_FORMATS:
+        for width in set_widths(image_width):
+            thumbnail = generate(name, _geometry(width), format=fmt)
+            rows.append((fmt, thumbnail.width, thumbnail.height,
+                         thumbnail.name))
+    return rows
+
+
+def missing_sets(images):
+    """Пары (имя, ширина) из images, у которых набор миниатюр неполон."""
+    from .models import Thumbnail
+
+    images = dict(images)
+    names = list(images)
+    done = {}
+    # пачками: у SQLite ограничено число параметров запроса
+    for start in range(0, len(names), 500):
+        for source, fmt, width in Thumbnail.objects.filter(
+            source__in=names[start:start + 500]
+        ).values_list('source', 'format', 'width'):
+            done.setdefault(source, set()).add((fmt, width))
+    return [
+        (name, image_width) for name, image_width in images.items()
+        if done.get(name, set()) != {
+            (fmt, width) for fmt in SET_FORMATS
+            for width in set_widths(image_width)
+        }
+    ]
+
+
+def _set_key(name):
+    return f'posts:thumbnails:{name}'
+
+
+def save_set(name, rows):
+    from .models import Thumbnail
+
+    Thumbnail.objects.bulk_create([
+        Thumbnail(source=name, format=fmt, width=width, height=height,
+                  name=thumbnail)
+        for fmt, width, height, thumbnail in rows
+    ], ignore_conflicts=True)
+    cache.delete(_set_key(name))
+
+
+def _generate_set_job(name, image_width):
+    """Задача пула процессов: у процесса свои соединения с базой."""
+    close_old_connections()
+    try:
+        return name, generate_set(name, image_width)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', name)
+        return name, []
+
+
+def generate_sets(images, workers=None):
+    """Генерирует наборы для пар (имя, ширина) пулом процессов.
+
+    Записи Thumbnail сохраняет родительский процесс; для каждой готовой
+    картинки возвращается её имя.
+    """
+    if workers == 1:
+        for name, image_width in images:
+            save_set(*_generate_set_job(name, image_width))
+            yield name
+        return
+    # дочерние процессы не должны делить соединение родителя
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        names, image_widths = zip(*images) if images else ((), ())
+        for name, rows in pool.map(
+            _generate_set_job, names, image_widths, chunksize=4
+        ):
+            save_set(name, rows)
+            yield name
+
+
+def _generate_in_background(name, image_width=None):
+    close_old_connections()
+    try:
+        save_set(name, generate_set(name, image_width))
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+        close_old_connections()
+
+
+def _submit(name, image_width=None, inline=True):
+    """Отдаёт генерацию пулу потоков.
+
+    Без пула (THUMBNAIL_POOL_WORKERS = 0) генерирует сразу, если inline;
+    из шаблонов inline=False: запрос не должен ждать PIL.
+    """
+    background = bool(settings.THUMBNAIL_POOL_WORKERS)
+    if not background and not inline:
+        return
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    if background:
+        _pool().submit(_generate_in_background, name, image_width)
+    else:
+        _generate_in_background(name, image_width)
+
+
+def _image_width(image):
+    return getattr(image.instance, 'image_width', None)
+
+
+def schedule(image):
+    """Ставит генерацию набора миниатюр в очередь после коммита."""
+    if image:
+        name, image_width = image.name, _image_width(image)
+        transaction.on_commit(lambda: _submit(name, image_width))
+
+
+def _cached_url(image):
+    thumbnail = backend.get_cached(
+        image.name, FEED_GEOMETRY, **FEED_OPTIONS
+    )
+    return None if thumbnail is None else thumbnail.url
+
+
+def feed_image_url(image):
+    """URL миниатюры для ленты; пока её нет — URL исходной картинки."""
+    if not image:
+        return ''
+    url = _cached_url(image)
+    if url is None:
+        _submit(image.name, _image_width(image), inline=False)
+        return image.url
+    return url
+
+
+def _srcset(rows, fmt):
+    return ', '.join(
+        f'{url} {width}w' for row_fmt, width, url in rows if row_fmt == fmt
+    )
+
+
+def _feed_image(image, rows):
+    if isinstance(rows, str):
+        # генерация идёт в фоне: запрос не ждёт PIL
+        _submit(image.name, _image_width(image), inline=False)
+        return FeedImage(rows, '', '', SIZES)
+    jpeg = [row for row in rows if row[0] == 'JPEG']
+    return FeedImage(
+        jpeg[-1][2], _srcset(rows, 'JPEG'), _srcset(rows, 'WEBP'), SIZES
+    )
+
+
+def feed_images(images):
+    """feed_image для картинок страницы по именам.
+
+    Наборы читаются из кеша одним get_many, промахи — одним запросом к
+    Thumbnail. Вместо отсутствующего набора кешируется адрес, который
+    отдаётся до его появления: save_set сбросит ключ.
+    """
+    from .models import Thumbnail
+
+    images = {image.name: image for image in images if image}
+    keys = {_set_key(name): name for name in images}
+    sets = {keys[key]: rows for key, rows in cache.get_many(keys).items()}
+    missing = {name: [] for name in images if name not in sets}
+    if missing:
+        thumbnails = Thumbnail.objects.filter(source__in=list(missing))
+        for source, fmt, width, name in thumbnails.order_by(
+            'width'
+        ).values_list('source', 'format', 'width', 'name'):
+            missing[source].append((fmt, width, default_storage.url(name)))
+        # у старых постов может быть миниатюра ленты, но не набор
+        legacy = backend.get_cached_many(
+            [name for name, rows in missing.items() if not rows],
+            FEED_GEOMETRY, **FEED_OPTIONS
+        )
+        for name, thumbnail in legacy.items():
+            missing[name] = (
+                images[name].url if thumbnail is None else thumbnail.url
+            )
+        cache.set_many(
+            {_set_key(name): rows for name, rows in missing.items()},
+            settings.FEED_CACHE_TIMEOUT,
+        )
+        sets.update(missing)
+    return {
+        name: _feed_image(images[name], rows) for name, rows in sets.items()
+    }
+
+
+def feed_image(image):
+    """Картинка ленты с srcset; пока набора нет — как feed_image_url."""
+    if not image:
+        return None
+    return feed_images([image])[image.name]
@@ -0,0 +1,277 @@
+"""Лента подписок: fan-out при записи с откатом на чтение для звёзд.
+
+Посты обычных авторов раскладываются в TimelineEntry подписчиков при
+публикации вместе с датой поста, ленты подписчиков обрезаются до
+TIMELINE_MAX_LENGTH записей одним DELETE. Авторов, у которых подписчиков
+больше TIMELINE_FANOUT_LIMIT, не рассылаем: их посты подмешиваются в
+ленту при чтении. Страница ленты читается курсором по индексу
+(user, -pub_date, -post) и по индексу постов каждой звезды, части
+сливаются в Python.
+"""
+import heapq
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby, islice
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .utils import CursorPaginator, bulk_insert
+
+logger = logging.getLogger(__name__)
+
+ORDERING = ('-pub_date', '-post_id')
+_position = itemgetter('pub_date', 'post_id')
+
+_lock = threading.Lock()
+_executor = None
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.TIMELINE_POOL_WORKERS,
+                thread_name_prefix='timeline',
+            )
+        return _executor
+
+
+def _run_in_background(func, *args):
+    close_old_connections()
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Не удалось обновить ленты: %s', func.__name__)
+    finally:
+        close_old_connections()
+
+
+def _defer(func, *args):
+    """После коммита отдаёт func пулу потоков.
+
+    Без пула (TIMELINE_POOL_WORKERS = 0) func выполняется сразу после
+    коммита в том же потоке.
+    """
+    def submit():
+        if settings.TIMELINE_POOL_WORKERS:
+            _pool().submit(_run_in_background, func, *args)
+        else:
+            func(*args)
+    transaction.on_commit(submit)
+
+
+def is_celebrity(author_id):
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+def _insert(entries):
+    bulk_insert(TimelineEntry, entries, ignore_conflicts=True)
+
+
+def trim(user_ids):
+    """Оставляет в лентах только TIMELINE_MAX_LENGTH последних записей.
+
+    user_ids — список или queryset id; номер записи в каждой ленте
+    считает оконная функция, лишнее удаляется одним DELETE.
+    """
+    ranked = TimelineEntry.objects.filter(user_id__in=user_ids).annotate(
+        position=Window(
+            RowNumber(), partition_by=[F('user_id')],
+            order_by=[F('pub_date').desc(), F('post_id').desc()],
+        )
+    ).values('pk', 'position')
+    sql, params = ranked.query.sql_with_params()
+    connection = connections[router.db_for_write(TimelineEntry)]
+    table = connection.ops.quote_name(TimelineEntry._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE id IN '
+            f'(SELECT id FROM ({sql}) WHERE position > %s)',
+            [*params, settings.TIMELINE_MAX_LENGTH],
+        )
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    fan_out_many([post])
+
+
+def fan_out_many(posts):
+    """fan_out для пачки постов: одним запросом на звёзд и подписчиков."""
+    authors = {post.author_id for post in posts}
+    celebrities = set(UserStats.objects.filter(
+        user_id__in=authors,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('user_id', flat=True))
+    followers = defaultdict(list)
+    follows = Follow.objects.filter(author_id__in=authors - celebrities)
+    pairs = follows.values_list('author_id', 'user_id')
+    for author_id, user_id in pairs.iterator():
+        followers[author_id].append(user_id)
+    if not followers:
+        return
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post.pk,
+                      pub_date=post.pub_date)
+        for post in posts
+        for user_id in followers[post.author_id]
+    )
+    trim(follows.values('user_id'))
+
+
+def _backfill(author_id, user_ids):
+    posts = list(Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')[:settings.TIMELINE_BACKFILL_SIZE])
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for user_id in user_ids
+        for post_id, pub_date in posts
+    )
+    trim(user_ids)
+
+
+def backfill(follow):
+    """Заполняет ленту нового подписчика последними постами автора."""
+    if is_celebrity(follow.author_id):
+        return
+    _backfill(follow.author_id, [follow.user_id])
+
+
+def backfill_followers(author_id):
+    """Раскладывает посты автора, переставшего быть звездой, подписчикам."""
+    if is_celebrity(author_id):
+        return
+    _backfill(author_id, Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True))
+
+
+def prune(follow):
+    """Убирает из ленты посты автора, от которого отписались.
+
+    Если автор при этом перестал быть звездой, его посты, вышедшие без
+    рассылки, раскладываются оставшимся подписчикам после коммита в
+    пуле потоков: это до TIMELINE_FANOUT_LIMIT × TIMELINE_BACKFILL_SIZE
+    записей.
+    """
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, post__author_id=follow.author_id
+    ).delete()
+    demoted = UserStats.objects.filter(
+        user_id=follow.author_id,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+    if demoted:
+        _defer(backfill_followers, follow.author_id)
+
+
+class _Merged:
+    """Одинаково упорядоченные querysets как один для CursorPaginator.
+
+    filter и order_by применяются к каждой части, срез [:n] читает из
+    каждой не больше n строк и сливает их без повторов: пост звезды
+    мог попасть в ленту, пока автор был ниже порога.
+    """
+    model = TimelineEntry
+
+    def __init__(self, parts, descending=True):
+        self.parts = parts
+        self.descending = descending
+
+    def filter(self, *args, **kwargs):
+        return _Merged(
+            [part.filter(*args, **kwargs) for part in self.parts],
+            self.descending,
+        )
+
+    def order_by(self, *fields):
+        return _Merged(
+            [part.order_by(*fields) for part in self.parts],
+            fields[0].startswith('-'),
+        )
+
+    def none(self):
+        return _Merged([], self.descending)
+
+    def __getitem__(self, key):
+        rows = heapq.merge(
+            *(part[key] for part in self.parts),
+            key=_position, reverse=self.descending,
+        )
+        distinct = (
+            next(group) for _, group in groupby(rows, key=_position)
+        )
+        return list(islice(distinct, key.stop))
+
+
+def _celebrities(user):
+    return Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True)
+
+
+def entries_for(user):
+    """Записи ленты подписок словарями {pub_date, post_id}."""
+    parts = [
+        TimelineEntry.objects.filter(user=user).values('pub_date', 'post_id')
+    ]
+    # по запросу на звезду: каждый идёт по индексу (author, -pub_date)
+    parts += [
+        Post.objects.filter(author_id=author_id).annotate(
+            post_id=F('pk')
+        ).values('pub_date', 'post_id')
+        for author_id in _celebrities(user)
+    ]
+    return _Merged(parts)
+
+
+def latest_update(user):
+    """Время последней правки постов ленты.
+
+    Постов в материализованной ленте не больше TIMELINE_MAX_LENGTH,
+    посты звёзд читаются по индексу (author, -updated_at).
+    """
+    posts = Post.objects.filter(
+        pk__in=TimelineEntry.objects.filter(user=user).values('post_id')
+    )
+    celebrities = Post.objects.filter(author_id__in=_celebrities(user))
+    dates = [
+        queryset.order_by('-updated_at').values_list(
+            'updated_at', flat=True
+        ).first()
+        for queryset in (posts, celebrities)
+    ]
+    return max(filter(None, dates), default=None)
+
+
+def feed_page(user, cursor=None, posts=None):
+    """Страница ленты подписок с постами из queryset posts.
+
+    Битый курсор поднимает InvalidCursor.
+    """
+    paginator = CursorPaginator(
+        entries_for(user), settings.POST_PER_PAGE, ordering=ORDERING
+    )
+    page = paginator.page(cursor)
+    ids = [row['post_id'] for row in page.object_list]
+    posts = Post.objects.for_feed() if posts is None else posts
+    found = {
+        row['pk'] if isinstance(row, dict) else row.pk: row
+        for row in posts.filter(pk__in=ids).order_by()
+    }
+    # пост могли удалить между чтением ленты и постов
+    page.object_list = [found[pk] for pk in ids if pk in found]
+    return page
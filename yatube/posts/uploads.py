@@ -0,0 +1,145 @@
+"""Обработка загруженных картинок постов.
+
+Большие загрузки Django пишет во временный файл кусками
+(FILE_UPLOAD_MAX_MEMORY_SIZE), Pillow читает из него только заголовок,
+пока не проверены размеры. Картинка уменьшается до POST_IMAGE_MAX_SIDE,
+поворачивается по EXIF и перекодируется без метаданных: прозрачные PNG
+остаются PNG, GIF — GIF, остальное сохраняется в JPEG. Анимации больше
+POST_IMAGE_MAX_SIDE не принимаются, остальные пересобираются по кадрам.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from PIL import Image, ImageOps, ImageSequence
+
+SPOOL_SIZE = 1024 * 1024
+FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif'}
+# у остальных многокадровых форматов (MPO, TIFF) берётся первый кадр
+ANIMATED = ('GIF', 'PNG')
+
+
+class ProcessedImage(File):
+    """Перекодированная картинка с её итоговыми размерами."""
+
+    def __init__(self, file, name, width, height):
+        super().__init__(file, name)
+        self.width = width
+        self.height = height
+
+
+def _output_format(image):
+    if image.format == 'GIF':
+        return 'GIF'
+    if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+        return 'PNG'
+    return 'JPEG'
+
+
+def _encode(image, fmt, output):
+    if fmt == 'JPEG':
+        image.convert('RGB').save(
+            output, 'JPEG', quality=settings.POST_IMAGE_QUALITY,
+            optimize=True, progressive=True,
+        )
+    elif fmt == 'PNG':
+        image.save(output, 'PNG', optimize=True)
+    else:
+        # без info Pillow теряет прозрачный цвет палитры
+        transparency = image.info.get('transparency')
+        options = {} if transparency is None else {
+            'transparency': transparency
+        }
+        image.save(output, 'GIF', **options)
+
+
+def _encode_animation(image, output):
+    """Пересобирает кадры анимации: метаданные файла не переносятся."""
+    # Pillow отдаёт кадры уже наложенными на предыдущие, поэтому
+    # disposal и blend исходника не переносятся
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(image):
+        copy = frame.copy()
+        # save берёт comment, icc_profile и exif из info кадра
+        copy.info = {
+            key: value for key, value in frame.info.items()
+            if key == 'transparency'
+        }
+        frames.append(copy)
+        durations.append(frame.info.get('duration', 100))
+    options = {'loop': image.info.get('loop', 0)}
+    if image.format == 'GIF' and 'transparency' in image.info:
+        options['transparency'] = image.info['transparency']
+    frames[0].save(
+        output, image.format, save_all=True, append_images=frames[1:],
+        duration=durations, **options
+    )
+
+
+def _animation(upload, image, width, height):
+    side = settings.POST_IMAGE_MAX_SIDE
+    if max(width, height) > side:
+        raise ValidationError(
+            'Анимация больше %(side)d пикселей по стороне.',
+            params={'side': side}, code='animation_too_large',
+        )
+    try:
+        # кадры декодируются по очереди, и все держатся в памяти
+        if width * height * image.n_frames > settings.POST_IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                'В анимации слишком много кадров.', code='too_many_frames',
+            )
+        output = tempfile.SpooledTemporaryFile(SPOOL_SIZE)
+        _encode_animation(image, output)
+    except (OSError, ValueError):
+        raise ValidationError(
+            'Не удалось прочитать изображение.', code='invalid_image'
+        )
+    output.seek(0)
+    name = f'{os.path.splitext(upload.name)[0]}.{FORMATS[image.format]}'
+    return ProcessedImage(output, name, width, height)
+
+
+def process_image(upload):
+    """Проверяет загрузку и возвращает ProcessedImage."""
+    if upload.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)d МБ.',
+            params={'limit': settings.POST_IMAGE_MAX_UPLOAD_SIZE >> 20},
+            code='file_too_large',
+        )
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Не удалось прочитать изображение.', code='invalid_image'
+        )
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Изображение %(width)d×%(height)d слишком большое.',
+            params={'width': width, 'height': height},
+            code='too_many_pixels',
+        )
+    if getattr(image, 'is_animated', False) and image.format in ANIMATED:
+        # draft и thumbnail оставили бы только первый кадр
+        return _animation(upload, image, width, height)
+    fmt = _output_format(image)
+    side = settings.POST_IMAGE_MAX_SIDE
+    # JPEG сразу декодируется в уменьшенном в 2–8 раз масштабе
+    image.draft('RGB', (side, side))
+    try:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((side, side), Image.LANCZOS)
+        output = tempfile.SpooledTemporaryFile(SPOOL_SIZE)
+        _encode(image, fmt, output)
+    except (OSError, ValueError):
+        raise ValidationError(
+            'Не удалось прочитать изображение.', code='invalid_image'
+        )
+    output.seek(0)
+    name = f'{os.path.splitext(upload.name)[0]}.{FORMATS[fmt]}'
+    return ProcessedImage(output, name, *image.size)
@@ -1,9 +1,167 @@
+import json
+from itertools import islice
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+BULK_CHUNK_SIZE = 1000
+CURSOR_PARAM = 'cursor'
+NEXT = 'n'
+PREVIOUS = 'p'
+SCALARS = (str, int, float)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (keyset): без COUNT(*) и без OFFSET.
+
+    Позиция страницы передаётся непрозрачным токеном, в котором
+    закодированы значения полей сортировки крайней записи.
+    """
+    cursor_param = CURSOR_PARAM
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-pk')):
+        self.ordering = tuple(ordering)
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+
+    def __getstate__(self):
+        # в кеш попадает страница, но не весь queryset ленты
+        state = self.__dict__.copy()
+        state['object_list'] = self.object_list.none()
+        return state
+
+    def _fields(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def _position(self, obj):
+        # строки .values() приходят словарями, а не объектами модели
+        if isinstance(obj, dict):
+            values = (obj[name] for name in self._fields())
+        else:
+            values = (getattr(obj, name) for name in self._fields())
+        # isoformat вместо DjangoJSONEncoder: тот обрезает микросекунды
+        return [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in values
+        ]
+
+    def encode_cursor(self, direction, obj):
+        payload = json.dumps([direction, self._position(obj)])
+        return urlsafe_base64_encode(payload.encode())
+
+    def decode_cursor(self, cursor):
+        try:
+            direction, values = json.loads(
+                force_str(urlsafe_base64_decode(cursor))
+            )
+        except (TypeError, ValueError):
+            raise InvalidCursor(cursor)
+        fields = self._fields()
+        if (direction not in (NEXT, PREVIOUS)
+                or not isinstance(values, list)
+                or len(values) != len(fields)
+                # None, списки и словари в условие фильтра не годятся
+                or not all(isinstance(value, SCALARS) for value in values)):
+            raise InvalidCursor(cursor)
+        try:
+            values = [
+                self._to_python(name, value)
+                for name, value in zip(fields, values)
+            ]
+        except Exception:
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def _to_python(self, name, value):
+        opts = self.object_list.model._meta
+        if name == 'pk':
+            return opts.pk.to_python(value)
+        try:
+            field = opts.get_field(name)
+        except FieldDoesNotExist:
+            # аннотация, например rank поиска: значение уже из JSON
+            return value
+        return field.to_python(value)
+
+    def _seek(self, values, backwards):
+        """Условие «строго после позиции» для текущей сортировки."""
+        condition = Q()
+        equal = {}
+        for name, value in zip(self.ordering, values):
+            descending = name.startswith('-')
+            field = name.lstrip('-')
+            lookup = 'lt' if descending != backwards else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def _reverse_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+
+    def page(self, cursor=None):
+        queryset = self.object_list
+        backwards = False
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+            backwards = direction == PREVIOUS
+            queryset = queryset.filter(self._seek(values, backwards))
+            if backwards:
+                queryset = queryset.order_by(*self._reverse_ordering())
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+        page = Page(rows, 1, self)
+        page.next_cursor = (
+            self.encode_cursor(NEXT, rows[-1])
+            if rows and has_next else None
+        )
+        page.previous_cursor = (
+            self.encode_cursor(PREVIOUS, rows[0])
+            if rows and has_previous else None
+        )
+        return page
+
+    def get_page(self, cursor=None):
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
 
 
 def get_page(queryset, request):
-    paginator = Paginator(queryset, settings.POST_PER_PAGE)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    if page_number is not None:
+        # старые ссылки вида ?page=N продолжают работать
+        paginator = Paginator(queryset, settings.POST_PER_PAGE)
+        return paginator.get_page(page_number)
+    paginator = CursorPaginator(queryset, settings.POST_PER_PAGE)
+    return paginator.get_page(request.GET.get(CURSOR_PARAM))
+
+
+def bulk_insert(model, objs, **kwargs):
+    """bulk_create для потока объектов: в памяти не больше одного чанка.
+
+    batch_size не передаётся: размер пачки внутри чанка Django подберёт
+    под ограничения SQLite на число параметров запроса.
+    """
+    objs = iter(objs)
+    chunk = list(islice(objs, BULK_CHUNK_SIZE))
+    while chunk:
+        model.objects.bulk_create(chunk, **kwargs)
+        chunk = list(islice(objs, BULK_CHUNK_SIZE))
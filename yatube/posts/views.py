@@ -1,50 +1,158 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseNotAllowed
+from django.db import transaction
+from django.http import Http404, HttpResponseNotAllowed, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
+from core.replicas import pins_primary, reads_from_replica
+
+from . import exporting
+from . import search as post_search
+from . import thumbnails, timeline
+from .caching import cached_page, feed_generation
+from .conditional import (conditional_page, latest_update, per_request,
+                          post_freshness)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import get_page
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .utils import CURSOR_PARAM, CursorPaginator, InvalidCursor
+
 
+def _feed_images(page_obj):
+    """Картинки страницы ленты для тега feed_image, одним запросом."""
+    return thumbnails.feed_images(post.image for post in page_obj)
 
-@cache_page(20)
+
+@reads_from_replica
 def index(request):
-    page_obj = get_page(Post.objects.all(), request)
-    return render(request, 'posts/index.html', {'page_obj': page_obj})
+    page_obj = cached_page('posts:index', Post.objects.for_feed(), request)
+    context = {
+        'page_obj': page_obj,
+        'feed_images': _feed_images(page_obj),
+        'fragment_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
+    return render(request, 'posts/index.html', context)
+
 
+@per_request
+def _group(request, slug):
+    return get_object_or_404(Group, slug=slug)
 
+
+def _group_freshness(request, slug):
+    group = _group(request, slug)
+    return (
+        feed_generation(), group.pk, group.title, group.description,
+        latest_update(group.posts.all()),
+    )
+
+
+@reads_from_replica
+@conditional_page(_group_freshness)
 def group_post(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    page_obj = get_page(group.posts.all(), request)
+    group = _group(request, slug)
+    page_obj = cached_page(
+        f'posts:group:{group.pk}', group.posts.for_feed(), request
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
+        'feed_images': _feed_images(page_obj),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = CursorPaginator(
+        post_search.search(query),
+        settings.POST_PER_PAGE,
+        ordering=('-rank', '-pk'),
+    )
+    page_obj = paginator.get_page(request.GET.get(CURSOR_PARAM))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'feed_images': _feed_images(page_obj),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@per_request
+def _author(request, username):
+    return get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+
+
+@per_request
+def _following(request, author):
+    return request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author=author
+    ).exists()
+
+
+def _profile_freshness(request, username):
+    author = _author(request, username)
+    return (
+        feed_generation(), author.pk, author.get_full_name(),
+        latest_update(author.posts.all()), _following(request, author),
+    )
+
+
+@reads_from_replica
+@conditional_page(_profile_freshness)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    page_obj = get_page(author.posts.all(), request)
-    following = False
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(user=request.user,
-                                          author=author).exists()
+    author = _author(request, username)
+    page_obj = cached_page(
+        f'posts:profile:{author.pk}', author.posts.for_feed(), request
+    )
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following
+        'feed_images': _feed_images(page_obj),
+        'following': _following(request, author),
+        'posts_count': getattr(author, 'stats', UserStats()).posts_count,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@per_request
+def _post(request, post_id):
+    return get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
+
+
+def _post_freshness(request, post_id):
+    post = _post(request, post_id)
+    parts = post_freshness(
+        post.pk, post.updated_at, post.version, post.comments_count
+    )
+    # на странице есть число постов автора и название группы
+    stats = getattr(post.author, 'stats', UserStats())
+    group = post.group.title if post.group else None
+    return parts + (stats.posts_count, group)
+
+
+def _comments_page(post_id, cursor=None):
+    """Страница комментариев поста с авторами одним JOIN."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only('text', 'created', 'author__username')
+    paginator = CursorPaginator(
+        comments, settings.COMMENTS_PER_PAGE, ordering=('-created', '-pk')
+    )
+    return paginator.page(cursor)
+
+
+@reads_from_replica
+@conditional_page(_post_freshness)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = _post(request, post_id)
     form = CommentForm(
         request.POST or None
     )
-    comments = post.comments.all()
+    comments = _comments_page(post.pk)
     context = {
         'post': post,
         'form': form,
@@ -53,7 +161,24 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+@reads_from_replica
+def post_comments(request, post_id):
+    """Следующая порция комментариев HTML-фрагментом."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    try:
+        comments = _comments_page(post.pk, request.GET.get(CURSOR_PARAM))
+    except InvalidCursor:
+        raise Http404
+    context = {
+        'post': post,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
+@pins_primary
+@transaction.atomic
 def post_create(request):
     if request.method not in ('GET', 'POST'):
         return HttpResponseNotAllowed(request.method)
@@ -65,11 +190,14 @@ def post_create(request):
         new_post = form.save(commit=False)
         new_post.author = request.user
         new_post.save()
+        thumbnails.schedule(new_post.image)
         return redirect('posts:profile', request.user)
     return render(request, 'posts/create_post.html', {'form': form})
 
 
 @login_required
+@pins_primary
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     if post.author != request.user:
@@ -80,7 +208,8 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        post = form.save()
+        thumbnails.schedule(post.image)
         return redirect('posts:post_detail', post_id)
     return render(
         request, 'posts/create_post.html',
@@ -89,6 +218,8 @@ def post_edit(request, post_id):
 
 
 @login_required
+@pins_primary
+@transaction.atomic
 def add_comment(request, post_id):
     post = Post.objects.get(pk=post_id)
     form = CommentForm(request.POST or None)
@@ -100,16 +231,25 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@reads_from_replica
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = get_page(posts, request)
-    context = {'page_obj': page_obj,
-               }
+    try:
+        page_obj = timeline.feed_page(
+            request.user, request.GET.get(CURSOR_PARAM)
+        )
+    except InvalidCursor:
+        page_obj = timeline.feed_page(request.user)
+    context = {
+        'page_obj': page_obj,
+        'feed_images': _feed_images(page_obj),
+    }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@pins_primary
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
@@ -121,6 +261,8 @@ def profile_follow(request, username):
 
 
 @login_required
+@pins_primary
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(
@@ -129,3 +271,19 @@ def profile_unfollow(request, username):
     ).delete()
 
     return redirect('posts:profile', username=username)
+
+
+@login_required
+def archive(request):
+    kind = request.GET.get('kind', 'posts')
+    fmt = request.GET.get('format', 'jsonl')
+    if kind not in exporting.EXPORTERS or fmt not in exporting.WRITERS:
+        raise Http404
+    response = StreamingHttpResponse(
+        exporting.export(kind, fmt, gzip=True,
+                         author=request.user.username),
+        content_type='application/gzip',
+    )
+    filename = f'{request.user.username}-{kind}.{fmt}.gz'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,26 @@
+"""Настройки проекта.
+
+Профиль выбирается переменной окружения DJANGO_ENV: dev (по умолчанию),
+test или prod. Профиль можно указать и напрямую через
+DJANGO_SETTINGS_MODULE=yatube.settings.prod.
+"""
+import os
+from importlib import import_module
+
+from django.core.exceptions import ImproperlyConfigured
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROFILES = ('dev', 'test', 'prod')
+PROFILE = os.getenv('DJANGO_ENV', default='dev')
+if PROFILE not in PROFILES:
+    raise ImproperlyConfigured(
+        f'DJANGO_ENV={PROFILE!r}, ожидается одно из: {", ".join(PROFILES)}'
+    )
+
+globals().update(
+    (name, value)
+    for name, value in vars(import_module(f'{__name__}.{PROFILE}')).items()
+    if name.isupper()
+)
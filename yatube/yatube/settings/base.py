@@ -0,0 +1,231 @@
+"""Общие настройки всех профилей; профили в dev.py, test.py и prod.py."""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = os.getenv('S_KEY', default='super_secret_key')
+
+# вставьте свой ключ с .env
+
+
+def env_flag(name, default):
+    """Булев флаг из переменной окружения: 1, true, yes, on."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = False
+
+ALLOWED_HOSTS = [
+    'localhost',
+    '127.0.0.1',
+    '[::1]',
+    'testserver',
+]
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'posts.apps.PostsConfig',
+    'users.apps.UsersConfig',
+    'core.apps.CoreConfig',
+    'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
+    'sorl.thumbnail',
+]
+
+MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'yatube.urls'
+
+
+def templates(cached):
+    """TEMPLATES с кеширующим загрузчиком или без него."""
+    options = {
+        'context_processors': [
+            'django.template.context_processors.debug',
+            'django.template.context_processors.request',
+            'django.contrib.auth.context_processors.auth',
+            'django.contrib.messages.context_processors.messages',
+            'core.context_processors.year.year'
+        ],
+    }
+    if cached:
+        options['loaders'] = [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ]
+    return [
+        {
+            'BACKEND': 'core.template_backends.InstrumentedDjangoTemplates',
+            'DIRS': [os.path.join(BASE_DIR, 'templates')],
+            'APP_DIRS': not cached,
+            'OPTIONS': options,
+        },
+    ]
+
+
+# разобранные шаблоны кешируются в памяти процесса; при DEBUG кеш
+# мешает правке шаблонов, поэтому профили включают его только без него
+CACHED_TEMPLATES = env_flag('CACHED_TEMPLATES', not DEBUG)
+# загрузить все шаблоны templates/ при старте WSGI-процесса
+TEMPLATE_WARMUP = env_flag('TEMPLATE_WARMUP', CACHED_TEMPLATES)
+TEMPLATES = templates(CACHED_TEMPLATES)
+
+WSGI_APPLICATION = 'yatube.wsgi.application'
+
+# Database
+# https://docs.djangoproject.com/en/2.2/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'core.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+    }
+}
+# реплика только для чтения, см. core/replicas.py; локально это копия
+# db.sqlite3, которую обновляет manage.py sync_replica
+REPLICA_DATABASE = 'replica'
+if os.getenv('DB_REPLICA'):
+    DATABASES[REPLICA_DATABASE] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DB_REPLICA'),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# с реплики читаются только модели лент; сессии и пользователи после
+# входа или регистрации должны быть видны сразу
+REPLICA_APPS = ('posts',)
+# сколько секунд после записи посетитель читает из default
+REPLICA_LAG = int(os.getenv('REPLICA_LAG', default=5))
+# выполняются для каждого соединения с SQLite, см. core/sqlite3/base.py
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    # отрицательное значение — в килобайтах, здесь 64 МБ на соединение
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': int(os.getenv('DB_TIMEOUT', default=5)) * 1000,
+    'temp_store': 'memory',
+}
+
+# Password validation
+# https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation'
+                '.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation'
+                '.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation'
+                '.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation'
+                '.NumericPasswordValidator',
+    },
+]
+
+# Internationalization
+# https://docs.djangoproject.com/en/2.2/topics/i18n/
+
+LANGUAGE_CODE = 'ru'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/2.2/howto/static-files/
+
+STATIC_URL = '/static/'
+STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
+DISPLAY_VALUE = '-пусто-'
+POST_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_BACKFILL_SIZE = 1000
+TIMELINE_MAX_LENGTH = 1000
+TIMELINE_POOL_WORKERS = 1
+FEED_CACHE_TIMEOUT = 60 * 60
+THUMBNAIL_POOL_WORKERS = 2
+LOGIN_URL = 'users:login'
+LOGIN_REDIRECT_URL = 'posts:index'
+# LOGOUT_REDIRECT_URL = 'users:logout'
+EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# загрузки больше этого пишутся на диск кусками, а не держатся в памяти
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024
+# картинки постов, см. posts/uploads.py
+POST_IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+POST_IMAGE_MAX_SIDE = 2048
+POST_IMAGE_QUALITY = 85
+# locmem — только для разработки: у каждого процесса свой кеш.
+# file и db разделяются между воркерами без внешних сервисов
+# (для db нужен manage.py createcachetable).
+CACHE_BACKENDS = {
+    'locmem': ('core.cache.InstrumentedLocMemCache', 'yatube'),
+    'file': (
+        'core.cache.InstrumentedFileBasedCache',
+        os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+    ),
+    'db': ('core.cache.InstrumentedDatabaseCache', 'yatube_cache'),
+}
+CACHE_BACKEND, CACHE_LOCATION = CACHE_BACKENDS[
+    os.getenv('CACHE_BACKEND', default='locmem')
+]
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', default='yatube'),
+        'VERSION': int(os.getenv('CACHE_VERSION', default=1)),
+    }
+}
+CSRF_FAILURE_VIEW = 'core.views.page_403'
+# адреса сборщика метрик; за прокси REMOTE_ADDR у всех одинаковый
+METRICS_ALLOWED_IPS = [
+    ip for ip in os.getenv('METRICS_ALLOWED_IPS', default='').split(',') if ip
+]
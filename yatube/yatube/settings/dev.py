@@ -0,0 +1,15 @@
+"""Локальная разработка: DEBUG и debug_toolbar."""
+from .base import *  # noqa: F401, F403
+from .base import INSTALLED_APPS, MIDDLEWARE, env_flag, templates
+
+DEBUG = True
+
+INSTALLED_APPS = INSTALLED_APPS + ['debug_toolbar']
+MIDDLEWARE = MIDDLEWARE + ['debug_toolbar.middleware.DebugToolbarMiddleware']
+INTERNAL_IPS = [
+    '127.0.0.1',
+]
+
+CACHED_TEMPLATES = env_flag('CACHED_TEMPLATES', False)
+TEMPLATE_WARMUP = env_flag('TEMPLATE_WARMUP', CACHED_TEMPLATES)
+TEMPLATES = templates(CACHED_TEMPLATES)
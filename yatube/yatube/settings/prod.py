@@ -0,0 +1,72 @@
+"""Боевой профиль.
+
+Секретный ключ и хосты берутся только из окружения. Соединения с базой
+живут CONN_MAX_AGE секунд вместо одного запроса; шаблоны, как и везде
+без DEBUG, кешируются и прогреваются при старте. Кеш только общий для
+воркеров (file по умолчанию или db). С DB_ENGINE=postgresql
+используется PostgreSQL (нужен psycopg2), иначе SQLite из base.py в
+режиме WAL.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401, F403
+from .base import (CACHE_BACKENDS, CACHES, DATABASES, REPLICA_DATABASE,
+                   SQLITE_PRAGMAS, env_flag)
+
+DEBUG = False
+
+SECRET_KEY = os.getenv('S_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Не задан S_KEY')
+ALLOWED_HOSTS = [
+    host for host in os.getenv('ALLOWED_HOSTS', default='').split(',') if host
+]
+
+# поколение лент и страницы лент должны быть общими для всех воркеров:
+# в locmem каждый воркер сдвигал бы только своё поколение
+CACHE_BACKEND_NAME = os.getenv('CACHE_BACKEND', default='file')
+if CACHE_BACKEND_NAME not in ('file', 'db'):
+    raise ImproperlyConfigured(
+        f'CACHE_BACKEND={CACHE_BACKEND_NAME!r}: в боевом профиле нужен '
+        'общий кеш, file или db'
+    )
+CACHE_BACKEND, CACHE_LOCATION = CACHE_BACKENDS[CACHE_BACKEND_NAME]
+CACHES = {
+    'default': {
+        **CACHES['default'],
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+    }
+}
+
+CONN_MAX_AGE = int(os.getenv('CONN_MAX_AGE', default=60))
+if os.getenv('DB_ENGINE') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', default='yatube'),
+            'USER': os.getenv('DB_USER', default='yatube'),
+            'PASSWORD': os.getenv('DB_PASSWORD', default=''),
+            'HOST': os.getenv('DB_HOST', default='localhost'),
+            'PORT': os.getenv('DB_PORT', default='5432'),
+        }
+    }
+    if os.getenv('DB_REPLICA_HOST'):
+        DATABASES[REPLICA_DATABASE] = {
+            **DATABASES['default'],
+            'HOST': os.getenv('DB_REPLICA_HOST'),
+            'TEST': {'MIRROR': 'default'},
+        }
+else:
+    # воркеров несколько, писатель ждёт блокировку дольше
+    SQLITE_PRAGMAS = {
+        **SQLITE_PRAGMAS,
+        'busy_timeout': int(os.getenv('DB_TIMEOUT', default=20)) * 1000,
+    }
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = CONN_MAX_AGE
+
+SESSION_COOKIE_SECURE = env_flag('SECURE_COOKIES', False)
+CSRF_COOKIE_SECURE = SESSION_COOKIE_SECURE
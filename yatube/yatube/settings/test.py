@@ -0,0 +1,24 @@
+"""Прогон тестов: быстрые хеши паролей и никаких фоновых потоков."""
+from .base import *  # noqa: F401, F403
+from .base import templates
+
+DEBUG = False
+
+# хеш по умолчанию намеренно медленный, а create_user в тестах много
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.InstrumentedLocMemCache',
+        'LOCATION': 'yatube-test',
+    }
+}
+# без пула миниатюры создаются сразу после коммита поста
+THUMBNAIL_POOL_WORKERS = 0
+TIMELINE_POOL_WORKERS = 0
+
+CACHED_TEMPLATES = False
+TEMPLATE_WARMUP = False
+TEMPLATES = templates(CACHED_TEMPLATES)